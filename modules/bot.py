@@ -1,5 +1,6 @@
 import asyncio
 import glob
+import inspect
 import logging
 import os
 
@@ -7,11 +8,24 @@ import discord
 from discord.ext import commands
 
 import __init__  # noqa
+from modules.utils import (
+    cooldown,
+    database,
+    executor,
+    grades,
+    helpers,
+    membership,
+    metadata,
+    schema,
+    storage,
+    uploads,
+)
 from modules.utils.config import config
 
 bot = commands.Bot(
     activity=discord.Activity(
-        type=discord.ActivityType.listening, name=config["bot"]["status"].as_str_expanded()
+        type=discord.ActivityType.listening,
+        name=config["bot"]["status"].as_str_expanded(),
     ),
     command_prefix=config["bot"]["prefix"].as_str_expanded(),
     help_command=None,
@@ -26,6 +40,23 @@ bot = commands.Bot(
 log = logging.getLogger(__name__)
 
 
+@bot.event
+async def setup_hook() -> None:
+    """
+    Called once after logging in, before connecting to the gateway.
+    """
+    await schema.migrate("grades", 1, grades.migrate)
+    await schema.migrate("teams", 1, membership.migrate)
+    await schema.ensure_indexes()
+    await schema.migrate("uploads", 1, metadata.backfill)
+    try:
+        await helpers.refresh_commands(bot)
+    except discord.HTTPException as error:
+        # get_command() refreshes the registry on first use instead.
+        log.error(f"Unable to fetch application commands: {error}")
+    await storage.backend.start()
+
+
 @bot.event
 async def on_ready() -> None:
     """
@@ -44,7 +75,28 @@ async def main() -> None:
             cog.replace("/", ".").replace("\\", ".").replace(".py", "")
         )
 
-    await bot.start(config["bot"]["token"].as_str_expanded())
+    try:
+        await bot.start(config["bot"]["token"].as_str_expanded())
+    finally:
+        await shutdown()
+
+
+async def shutdown() -> None:
+    """Release every resource, carrying on past any step that fails."""
+    steps = [
+        ("flush cooldowns", cooldown.manager.flush),
+        ("close storage backend", storage.backend.close),
+        ("close upload session", uploads.uploader.close),
+        ("close MongoDB client", database.Database.close),
+        ("shut down executors", executor.shutdown),
+    ]
+    for description, step in steps:
+        try:
+            result = step()
+            if inspect.isawaitable(result):
+                await result
+        except Exception:
+            log.exception(f"Unable to {description} on shutdown.")
 
 
 if __name__ == "__main__":
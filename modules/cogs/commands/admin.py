@@ -4,7 +4,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from modules.utils import embeds, helpers
+from modules.utils import embeds, executor, helpers
 
 log = logging.getLogger(__name__)
 
@@ -25,6 +25,7 @@ class AdminCog(commands.GroupCog, group_name="admin"):
             return await interaction.followup.send(embed=embed)
 
         synced = await self.bot.tree.sync()
+        await helpers.refresh_commands(self.bot)
         embed = embeds.make_embed(
             interaction=interaction,
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
@@ -44,6 +45,7 @@ class AdminCog(commands.GroupCog, group_name="admin"):
             return await interaction.followup.send(embed=embed)
 
         synced = await self.bot.tree.sync(guild=interaction.guild)
+        await helpers.refresh_commands(self.bot)
         embed = embeds.make_embed(
             interaction=interaction,
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
@@ -69,6 +71,7 @@ class AdminCog(commands.GroupCog, group_name="admin"):
 
         self.bot.tree.copy_global_to(guild=interaction.guild)
         synced = await self.bot.tree.sync(guild=interaction.guild)
+        await helpers.refresh_commands(self.bot)
         embed = embeds.make_embed(
             interaction=interaction,
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
@@ -94,6 +97,7 @@ class AdminCog(commands.GroupCog, group_name="admin"):
 
         self.bot.tree.clear_commands(guild=interaction.guild)
         await self.bot.tree.sync(guild=interaction.guild)
+        await helpers.refresh_commands(self.bot)
         embed = embeds.make_embed(
             interaction=interaction,
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
@@ -103,6 +107,41 @@ class AdminCog(commands.GroupCog, group_name="admin"):
         )
         await interaction.followup.send(embed=embed)
 
+    @app_commands.command(
+        name="executor", description="Show the load of the background worker pools."
+    )
+    async def executor_stats(self, interaction: discord.Interaction) -> None:
+        """Queue depth and timings of the thread pools used for blocking work."""
+        await interaction.response.defer(ephemeral=True)
+
+        embed = await helpers.bot_owner_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.followup.send(embed=embed)
+
+        fields = []
+        for pool in executor.pools:
+            stats = pool.stats()
+            fields.append(
+                {
+                    "name": f"{stats['name'].capitalize()} ({stats['workers']} workers):",
+                    "value": f"Queued: {stats['queued']}, running: {stats['running']}\n"
+                    f"Completed: {stats['completed']}, failed: {stats['failed']}\n"
+                    f"Wait: {stats['average_wait_ms']:.1f} ms average, "
+                    f"{stats['max_wait_ms']:.1f} ms max\n"
+                    f"Run: {stats['average_run_ms']:.1f} ms average",
+                    "inline": False,
+                }
+            )
+
+        embed = embeds.make_embed(
+            interaction=interaction,
+            thumbnail_url="https://i.imgur.com/W7VJssL.png",
+            title="Executor",
+            fields=fields,
+            timestamp=True,
+        )
+        await interaction.followup.send(embed=embed)
+
     @sync_global.error
     @sync_guild.error
     @sync_global_to_guild.error
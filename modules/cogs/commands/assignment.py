@@ -1,17 +1,23 @@
-import asyncio
 import logging
 import pathlib
-from typing import List
+from typing import Awaitable, Callable, List
 
 import arrow
 import discord
-import magic
-import requests
 from discord import app_commands
 from discord.ext import commands
-from requests_toolbelt import MultipartEncoder
 
-from modules.utils import database, embeds, helpers
+from modules.utils import (
+    autocomplete,
+    database,
+    embeds,
+    helpers,
+    ingest,
+    metadata,
+    pagination,
+    scoring,
+    storage,
+)
 
 log = logging.getLogger(__name__)
 
@@ -32,18 +38,16 @@ class AssignmentCog(commands.GroupCog, group_name="assignment"):
             timestamp=True,
         )
 
-        collection = database.Database().get_collection("assignments")
-        query = {"guild_id": interaction.guild_id}
-        assignments = [item for item in collection.find(query).sort("name")]
-        options = [
-            discord.SelectOption(label=assignment["name"]) for assignment in assignments
-        ]
+        source = pagination.QuerySource(
+            "assignments", {"guild_id": interaction.guild_id}
+        )
+        dropdown = AssignmentDropdown(source=source)
 
         view = discord.ui.View()
 
-        if options:
+        if await dropdown.load():
             embed.description = "Use the dropdown below to select an assignment."
-            view.add_item(AssignmentDropdown(options=options))
+            dropdown.add_to(view)
         else:
             embed.description = (
                 "No assignments are available at the moment. Please check back later!"
@@ -95,7 +99,7 @@ class AssignmentCog(commands.GroupCog, group_name="assignment"):
 
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": assignment}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         if result is None:
             embed = embeds.make_embed(
@@ -113,17 +117,31 @@ class AssignmentCog(commands.GroupCog, group_name="assignment"):
             .parents[3]
             .joinpath("uploads", str(interaction.guild_id), "assignments", assignment)
         )
-        file_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = await ingest.ingest(
+                attachment, interaction.guild_id, file_dir, interaction.user.id
+            )
+        except ingest.IngestError as error:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            return await interaction.edit_original_response(embed=embed)
 
-        file_path = file_dir.joinpath(attachment.filename)
-        await attachment.save(file_path)
+        description = f"Successfully uploaded an attachment to '{assignment}'."
+        if replaced:
+            description += f" It replaced the previous '{attachment.filename}'."
 
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
             title="Attachment uploaded",
-            description=f"Successfully uploaded an attachment to '{assignment}'.",
+            description=description,
             timestamp=True,
         )
 
@@ -134,28 +152,22 @@ class AssignmentCog(commands.GroupCog, group_name="assignment"):
         self, interaction: discord.Interaction, current: str
     ) -> List[app_commands.Choice[str]]:
         """Autocomplete function to suggest a list of available assignments when its being typed in."""
-        collection = database.Database().get_collection("assignments")
-        query = {"guild_id": interaction.guild_id}
-        assignments = [result["name"] for result in collection.find(query).sort("name")]
+        assignments = await autocomplete.assignments.search(
+            guild_id=interaction.guild_id, current=current
+        )
         return [
             app_commands.Choice(name=assignment, value=assignment)
             for assignment in assignments
-            if current.lower() in assignment.lower()
         ]
 
 
-class AssignmentDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]) -> None:
-        super().__init__()
-        self.options = options
+class AssignmentDropdown(pagination.PaginatedSelect):
+    def __init__(self, source: pagination.QuerySource) -> None:
+        super().__init__(source=source)
 
     async def callback(self, interaction: discord.Interaction) -> None:
         """Dropdown callback after an assignment is selected with buttons.
-        self.view.children[0] is the dropdown.
-        self.view.children[1] is the create assignment button.
-        self.view.children[2] is the edit assignment button.
-        self.view.children[3] is the remove assignment button.
-        self.view.children[4] is the peer review disabled/enabled button.
+        Buttons are looked up by custom_id because page buttons may come before them.
         self.values[0] is the currently selected assignment name.
         """
         await interaction.response.defer(ephemeral=True)
@@ -168,12 +180,7 @@ class AssignmentDropdown(discord.ui.Select):
 
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": self.values[0]}
-        result = collection.find_one(query)
-
-        hyperlinks_list = await get_hyperlinks(
-            interaction=interaction, assignment_name=result["name"]
-        )
-        hyperlinks = "\n".join(hyperlinks_list)
+        result = await collection.find_one(query)
 
         due_date = arrow.Arrow.fromtimestamp(result["due_date"], tzinfo="EST")
         duration_string = (
@@ -182,58 +189,76 @@ class AssignmentDropdown(discord.ui.Select):
 
         embed = await helpers.instructor_check(interaction)
         if not isinstance(embed, discord.Embed):
+            buttons = {
+                children.custom_id: children
+                for children in self.view.children
+                if isinstance(children, discord.ui.Button)
+            }
+
             # Re-enable the edit and remove buttons that were disabled earlier at main view.
-            self.view.children[2].disabled = False
-            self.view.children[3].disabled = False
+            buttons["edit_assignment"].disabled = False
+            buttons["remove_assignment"].disabled = False
 
             # Set the assignment name attribute for the buttons so that we can use them for database query.
-            self.view.children[2].assignment_name = self.values[0]
-            self.view.children[3].assignment_name = self.values[0]
+            buttons["edit_assignment"].assignment_name = self.values[0]
+            buttons["remove_assignment"].assignment_name = self.values[0]
 
             peer_review_button = PeerReviewButton(
                 assignment_name=self.values[0],
-                peer_review=collection.find_one(query)["peer_review"],
+                peer_review=result["peer_review"],
             )
 
             # To prevent new peer review buttons being added to view whenever we select a different assignment, we remove
             # the existing button and add it again so that it reflects the peer review status of the newly selected assignment.
-            if any(
-                children.custom_id in ("peer_review_enabled", "peer_review_disabled")
-                for children in self.view.children
-            ):
-                self.view.remove_item(self.view.children[4])
-                self.view.add_item(peer_review_button)
-            else:
-                self.view.add_item(peer_review_button)
+            for custom_id in ("peer_review_enabled", "peer_review_disabled"):
+                if custom_id in buttons:
+                    self.view.remove_item(buttons[custom_id])
+            self.view.add_item(peer_review_button)
+
+        def make_embed(hyperlinks_list: list[str]) -> discord.Embed:
+            hyperlinks = "\n".join(hyperlinks_list)
+            return embeds.make_embed(
+                interaction=interaction,
+                thumbnail_url="https://i.imgur.com/HcZHHdQ.png",
+                title="Assignments",
+                description="Use the dropdown below to select an assignment.",
+                fields=[
+                    {
+                        "name": "Assignment Name:",
+                        "value": result["name"],
+                        "inline": False,
+                    },
+                    {
+                        "name": "Points Possible:",
+                        "value": result["points"],
+                        "inline": False,
+                    },
+                    {"name": "Due Date:", "value": duration_string, "inline": False},
+                    {
+                        "name": "Instructions:",
+                        "value": result["instructions"],
+                        "inline": False,
+                    },
+                    {
+                        "name": "Attachment:",
+                        "value": f"{hyperlinks if hyperlinks else None}",
+                        "inline": False,
+                    },
+                ],
+                timestamp=True,
+            )
 
-        embed = embeds.make_embed(
+        async def on_update(hyperlinks_list: list[str]) -> None:
+            await interaction.edit_original_response(embed=make_embed(hyperlinks_list))
+
+        hyperlinks_list = await get_hyperlinks(
             interaction=interaction,
-            thumbnail_url="https://i.imgur.com/HcZHHdQ.png",
-            title="Assignments",
-            description="Use the dropdown below to select an assignment.",
-            fields=[
-                {"name": "Assignment Name:", "value": result["name"], "inline": False},
-                {
-                    "name": "Points Possible:",
-                    "value": result["points"],
-                    "inline": False,
-                },
-                {"name": "Due Date:", "value": duration_string, "inline": False},
-                {
-                    "name": "Instructions:",
-                    "value": result["instructions"],
-                    "inline": False,
-                },
-                {
-                    "name": "Attachment:",
-                    "value": f"{hyperlinks if hyperlinks else None}",
-                    "inline": False,
-                },
-            ],
-            timestamp=True,
+            assignment_name=result["name"],
+            on_update=on_update,
+        )
+        await interaction.edit_original_response(
+            embed=make_embed(hyperlinks_list), view=self.view
         )
-
-        await interaction.edit_original_response(embed=embed, view=self.view)
 
 
 class CreateAssignmentButton(discord.ui.Button):
@@ -260,7 +285,7 @@ class EditAssignmentButton(discord.ui.Button):
         """The callback that sends a modal after the edit assignment button is hit."""
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": self.assignment_name}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         due_date = arrow.Arrow.fromtimestamp(result["due_date"], tzinfo="EST")
         duration_string = f"{due_date.format('MM/DD/YYYY HH:mm')}"
@@ -286,7 +311,7 @@ class RemoveAssignmentButton(discord.ui.Button):
         """The callback that edit the message to a warning with confirmation buttons before removing."""
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": self.assignment_name}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         hyperlinks_list = await get_hyperlinks(
             interaction=interaction, assignment_name=result["name"]
@@ -338,7 +363,8 @@ class RemoveAssignmentConfirmButtons(discord.ui.View):
         """The confirm button to remove an assignment."""
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": self.name}
-        collection.delete_one(query)
+        await collection.delete_one(query)
+        autocomplete.assignments.invalidate(interaction.guild_id)
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
@@ -413,7 +439,7 @@ class CreateAssignmentModal(discord.ui.Modal, title="Create Assignment"):
         """The submit button to save all the input values of the new assignment."""
         collection = database.Database().get_collection("assignments")
         query = {"guild_id": interaction.guild_id, "name": self.assignment_name.value}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
         if result and result["name"] in (
             self.assignment_name.value,
             self.assignment_name.value.lower(),
@@ -484,7 +510,8 @@ class CreateAssignmentModal(discord.ui.Modal, title="Create Assignment"):
             "instructions": self.instructions.value,
             "peer_review": False,
         }
-        collection.insert_one(document)
+        await collection.insert_one(document)
+        autocomplete.assignments.invalidate(interaction.guild_id)
 
         upload_command = await helpers.get_command(
             interaction=interaction, command="assignment", subcommand_group="upload"
@@ -651,7 +678,11 @@ class EditAssignmentModal(discord.ui.Modal, title="Edit Assignment"):
                 "instructions": self.instructions.value,
             }
         }
-        collection.update_one(query, new_value)
+        previous = await collection.find_one_and_update(query, new_value)
+        autocomplete.assignments.invalidate(interaction.guild_id)
+        # Of all assignment fields, calibrated scores only depend on the maximum points.
+        if previous is not None and previous["points"] != points:
+            scoring.engine.recompute(interaction.guild_id, self.name.value)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -746,7 +777,8 @@ class PeerReviewButton(discord.ui.Button):
             self.custom_id = "peer_review_enabled"
             new_value = {"$set": {"peer_review": True}}
 
-        collection.update_one(query, new_value)
+        await collection.update_one(query, new_value)
+        autocomplete.assignments.invalidate(interaction.guild_id)
 
         await interaction.response.edit_message(
             embed=interaction.message.embeds[0], view=self.view
@@ -754,38 +786,28 @@ class PeerReviewButton(discord.ui.Button):
 
 
 async def get_hyperlinks(
-    interaction: discord.Interaction, assignment_name: str
+    interaction: discord.Interaction,
+    assignment_name: str,
+    on_update: Callable[[list[str]], Awaitable[None]] = None,
 ) -> list[str]:
-    """Support method to generate a list of hyperlinks from our uploads in a new thread."""
-
-    def task() -> list:
-        root = pathlib.Path(__file__).parents[3]
-        file_dir = root.joinpath(
-            "uploads", str(interaction.guild_id), "assignments", assignment_name
-        ).glob("**/*")
-        links = []
-        for item in file_dir:
-            if not item.is_file():
-                continue
-
-            file = item.open(mode="rb")
-            mime_type = magic.from_buffer(file.read(2048), mime=True)
-            file.seek(0)
-            fields = {
-                "time": "1h",
-                "reqtype": "fileupload",
-                "fileToUpload": (item.name, file, mime_type),
-            }
-            encoder = MultipartEncoder(fields=fields)
-            response = requests.post(
-                url="https://litterbox.catbox.moe/resources/internals/api.php",
-                data=encoder,
-                headers={"Content-Type": encoder.content_type},
-            )
-            links.append(f"[Download]({response.text})")
-        return links
+    """Support method to upload the attachments of an assignment and generate a list of hyperlinks.
+    If given, on_update is called with the hyperlinks available so far while the uploads are running.
+    """
+    root = pathlib.Path(__file__).parents[3]
+    file_dir = root.joinpath(
+        "uploads", str(interaction.guild_id), "assignments", assignment_name
+    )
+    files = await metadata.get_files(interaction.guild_id, file_dir)
+
+    async def update(links: list[str | None]) -> None:
+        await on_update(storage.hyperlinks(links, done=False))
 
-    return await asyncio.to_thread(task)
+    links = await storage.backend.get_links(
+        [metadata.local_path(file) for file in files],
+        on_update=update if on_update else None,
+        mime_types=[file["mime_type"] for file in files],
+    )
+    return storage.hyperlinks(links)
 
 
 async def setup(bot: commands.Bot) -> None:
@@ -5,7 +5,7 @@ import openai
 from discord import app_commands
 from discord.ext import commands
 
-from modules.utils import embeds
+from modules.utils import embeds, executor
 from modules.utils.config import config
 
 log = logging.getLogger(__name__)
@@ -30,7 +30,8 @@ class ChatGPTCog(commands.Cog):
 
         openai.api_key = config["openai"]["api_key"].as_str_expanded()
         try:
-            response = openai.ChatCompletion.create(
+            response = await executor.http.run(
+                openai.ChatCompletion.create,
                 model="gpt-3.5-turbo",
                 messages=[{"role": "user", "content": f"{prompt}"}],
             )
@@ -65,8 +66,12 @@ class ChatGPTCog(commands.Cog):
 
         openai.api_key = config["openai"]["api_key"].as_str_expanded()
         try:
-            response = openai.Image.create(
-                prompt=f"{prompt}", n=1, size="1024x1024", response_format="url"
+            response = await executor.http.run(
+                openai.Image.create,
+                prompt=f"{prompt}",
+                n=1,
+                size="1024x1024",
+                response_format="url",
             )
         except (
             openai.error.APIError,
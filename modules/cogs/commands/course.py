@@ -20,7 +20,7 @@ class CourseCog(commands.GroupCog, group_name="course"):
         """Main view of the course interface, to be reused by other methods when the "back" button is hit."""
         collection = database.Database().get_collection("courses")
         query = {"guild_id": interaction.guild_id, "user_id": interaction.user.id}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -105,7 +105,7 @@ class EditCourseButton(discord.ui.Button):
 
         collection = database.Database().get_collection("courses")
         query = {"guild_id": interaction.guild_id, "user_id": interaction.user.id}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         edit_course_modal = EditCourseModal(
             course_name=result["course_name"],
@@ -131,7 +131,7 @@ class RemoveCourseButton(discord.ui.Button):
 
         collection = database.Database().get_collection("courses")
         query = {"guild_id": interaction.guild_id, "user_id": interaction.user.id}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -218,7 +218,7 @@ class CreateCourseModal(discord.ui.Modal, title="Create Course"):
             "semester": self.semester.value,
             "crn": self.crn.value,
         }
-        collection.insert_one(document)
+        await collection.insert_one(document)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -334,7 +334,7 @@ class EditCourseModal(discord.ui.Modal, title="Edit Course"):
                 "crn": self.crn.value,
             }
         }
-        collection.update_one(query, new_value)
+        await collection.update_one(query, new_value)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -398,7 +398,7 @@ class ConfirmButtons(discord.ui.View):
     ) -> None:
         collection = database.Database().get_collection("courses")
         query = {"guild_id": interaction.guild_id, "user_id": interaction.user.id}
-        collection.delete_one(query)
+        await collection.delete_one(query)
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
@@ -56,6 +56,12 @@ class HelpCog(commands.Cog):
             subcommand_group="review",
             subcommand="download",
         )
+        peer_review_export = await helpers.get_command(
+            interaction=interaction,
+            command="peer",
+            subcommand_group="review",
+            subcommand="export",
+        )
         settings_team_size = await helpers.get_command(
             interaction=interaction,
             command="settings",
@@ -101,6 +107,12 @@ class HelpCog(commands.Cog):
         team_remove = await helpers.get_command(
             interaction=interaction, command="team", subcommand_group="remove"
         )
+        team_import = await helpers.get_command(
+            interaction=interaction, command="team", subcommand_group="import"
+        )
+        team_auto = await helpers.get_command(
+            interaction=interaction, command="team", subcommand_group="auto"
+        )
         team_lock = await helpers.get_command(
             interaction=interaction, command="team", subcommand_group="lock"
         )
@@ -130,6 +142,9 @@ class HelpCog(commands.Cog):
             f"{team_rename.mention}: Rename a team. This is the student version of {team_edit.mention} that only allows updating their own team.\n\n"
             f"{team_edit.mention}: Instructor only. Forcefully update the name of any team.\n\n"
             f"{team_remove.mention}: Instructor only. Remove a team. This is strongly discouraged unless the team is empty.\n\n"
+            f"{team_import.mention}: Instructor only. Create teams from a CSV roster with a team and a member column, and optionally a "
+            f"section column.\n\n"
+            f"{team_auto.mention}: Instructor only. Put every student who is not in a team yet into new teams of the team size.\n\n"
             f"{team_lock.mention}: Instructor only. Lock all current teams, disallowing students from creating, updating, leaving, or "
             f"joining a team.\n\n"
             f"{team_unlock.mention}: Instructor only. Unlock all current teams, re-allowing students to create, update, leave, or join a team.\n\n"
@@ -137,10 +152,11 @@ class HelpCog(commands.Cog):
             f"{assignment_view.mention}: View and manage your current assignments, or create a new one. Instructors can update the assignment.\n\n"
             f"{assignment_upload.mention}: Instructor only. Upload an attachment to an assignment.\n\n"
             "__Peer review:__\n\n"
-            f"{peer_review_distribute.mention}: Instructor only. Distribute peer review to teams. Note that every time you use this command, "
-            f"the peer review result for all teams will be reshuffled.\n\n"
+            f"{peer_review_distribute.mention}: Instructor only. Distribute peer review of an assignment to teams. Note that every time you use this command, "
+            f"the peer review result of that assignment will be reshuffled for all teams.\n\n"
             f"{peer_review_grade.mention}: Grade a peer review submission. Students can only peer review assignments that are not due yet on "
             f"teams they were assigned.\n\n"
+            f"{peer_review_export.mention}: Instructor only. Export every grade of every assignment as a CSV file.\n\n"
             f"{peer_review_download.mention}: Download all submissions of a peer review assignment by a team. Students can only download "
             f"peer reviews of teams they were assigned.\n\n"
             "__Submission:__\n\n"
@@ -1,18 +1,26 @@
-import asyncio
 import logging
-import pathlib
-import random
+from typing import List
 
 import arrow
 import discord
 import discord.ui
-import magic
-import requests
 from discord import app_commands
 from discord.ext import commands
-from requests_toolbelt import MultipartEncoder
-
-from modules.utils import embeds, database, helpers
+from pymongo.errors import PyMongoError
+
+from modules.utils import (
+    autocomplete,
+    bundles,
+    distribution,
+    embeds,
+    executor,
+    database,
+    grades,
+    helpers,
+    pagination,
+    scoring,
+    storage,
+)
 
 log = logging.getLogger(__name__)
 
@@ -24,19 +32,52 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
     peer_review = app_commands.Group(name="review", description="Peer review commands.")
 
     @peer_review.command(name="distribute", description="Distribute the peer reviews.")
-    async def distribute(self, interaction: discord.Interaction) -> None:
+    @app_commands.describe(
+        assignment="Assignment to distribute peer reviews for.",
+        strategy="How teams are paired. Defaults to avoiding previous pairings.",
+        seed="Seed to reproduce a previous distribution.",
+    )
+    @app_commands.choices(
+        strategy=[
+            app_commands.Choice(name="Cyclic", value="cyclic"),
+            app_commands.Choice(name="Random", value="random"),
+            app_commands.Choice(name="Avoid previous pairings", value="avoid_previous"),
+            app_commands.Choice(name="Within sections", value="section"),
+        ]
+    )
+    async def distribute(
+        self,
+        interaction: discord.Interaction,
+        assignment: str,
+        strategy: app_commands.Choice[str] = None,
+        seed: app_commands.Range[int, 0, 2**32 - 1] = None,
+    ) -> None:
         embed = await helpers.instructor_check(interaction)
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        assignment_collection = database.Database().get_collection("assignments")
+        assignment_query = {"guild_id": interaction.guild_id, "name": assignment}
+        assignment_result = await assignment_collection.find_one(assignment_query)
+
+        if assignment_result is None or not assignment_result["peer_review"]:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="The specified assignment does not exist or does not have peer review enabled.",
+                timestamp=True,
+            )
+            return await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        settings_result = await helpers.get_settings(interaction.guild_id)
         peer_review_size = settings_result["peer_review_size"]
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id}
-        teams = [team["name"] for team in team_collection.find(team_query)]
+        team_results = await team_collection.find(team_query).to_list()
+        teams = [team["name"] for team in team_results]
 
         if not teams:
             embed = embeds.make_embed(
@@ -66,19 +107,28 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
             )
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        random.shuffle(teams)
-        peer_reviews = {}
-        for index, value in enumerate(teams):
-            # Review the teams that are after the current team in the list.
-            reviews_index = list(range(index + 1, index + peer_review_size + 1))
-            # If the index is larger than the length of the list, wrap around to the start of the list.
-            peer_reviews[value] = [teams[i % len(teams)] for i in reviews_index]
-
-        peer_reviews_list = [
-            f"{index + 1}. {key}: {', '.join(value)}\n"
-            for index, (key, value) in enumerate(peer_reviews.items())
-        ]
-        peer_review_string = "".join(peer_reviews_list)
+        strategy = strategy.value if strategy else "avoid_previous"
+        result = distribution.distribute(
+            teams=teams,
+            size=peer_review_size,
+            strategy=strategy,
+            seed=seed,
+            history=await distribution.get_history(interaction.guild_id),
+            sections={team["name"]: team.get("section") for team in team_results},
+        )
+        peer_reviews = result.as_dict()
+
+        # Embed descriptions are limited to 4096 characters, large guilds only get a preview.
+        peer_review_string = ""
+        for index, (key, value) in enumerate(peer_reviews.items()):
+            line = f"{index + 1}. {key}: {', '.join(value)}\n"
+            if len(peer_review_string) + len(line) > 3000:
+                peer_review_string += (
+                    f"...and {len(peer_reviews) - index} more teams.\n"
+                )
+                break
+            peer_review_string += line
+        peer_review_string += f"\nSeed: {result.seed}"
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -86,8 +136,8 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
             thumbnail_url="https://i.imgur.com/s1sRlvc.png",
             title="Peer review distribution",
             description=(
-                "You are about to distribute teams for peer review. Please note that if you run this command again, "
-                "all teams will be redistributed randomly again.\n\n"
+                f"You are about to distribute teams for peer review of **{assignment}**. Please note that if you run "
+                "this command again, all teams will be redistributed for this assignment.\n\n"
                 "Distribution preview:\n\n"
                 f"{peer_review_string}"
             ),
@@ -96,11 +146,28 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
         await interaction.response.send_message(
             embed=embed,
             view=DistributeConfirmButtons(
-                peer_reviews=peer_reviews, peer_review_string=peer_review_string
+                assignment=assignment,
+                strategy=strategy,
+                result=result,
+                peer_review_string=peer_review_string,
             ),
             ephemeral=True,
         )
 
+    @distribute.autocomplete("assignment")
+    async def distribute_autocomplete(
+        self, interaction: discord.Interaction, current: str
+    ) -> List[app_commands.Choice[str]]:
+        assignments = await autocomplete.assignments.search(
+            guild_id=interaction.guild_id,
+            current=current,
+            predicate=lambda assignment: assignment.peer_review,
+        )
+        return [
+            app_commands.Choice(name=assignment, value=assignment)
+            for assignment in assignments
+        ]
+
     @staticmethod
     async def grade_view(
         interaction: discord.Interaction,
@@ -109,45 +176,59 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        team_result = team_collection.find_one(team_query)
-
-        if team_result and not team_result["peer_review"]:
-            embed = embeds.make_embed(
-                color=discord.Color.red(),
-                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
-                title="Error",
-                description="Peer review distribution for teams has not been performed yet. Please check back later!",
-                timestamp=True,
-            )
-            return embed, view
-
-        assignment_collection = database.Database().get_collection("assignments")
-        assignment_query = {"guild_id": interaction.guild_id}
-        assignment_results = assignment_collection.find(assignment_query)
+        team_result = await team_collection.find_one(team_query)
 
         check = await helpers.instructor_check(interaction)
         if isinstance(check, discord.Embed):
-            current_timestamp = arrow.Arrow.utcnow().timestamp()
-            assignment_options = [
-                discord.SelectOption(label=assignment["name"])
-                for assignment in assignment_results
-                if assignment["due_date"] > current_timestamp
-                and assignment["peer_review"]
-            ]
-            team_options = [
-                discord.SelectOption(label=team) for team in team_result["peer_review"]
-            ]
+            peer_reviews = {}
+            if team_result:
+                assignment_collection = database.Database().get_collection(
+                    "assignments"
+                )
+                assignment_query = {
+                    "guild_id": interaction.guild_id,
+                    "peer_review": True,
+                    "due_date": {"$gt": arrow.Arrow.utcnow().timestamp()},
+                }
+                async for assignment in assignment_collection.find(
+                    assignment_query, {"name": 1}
+                ):
+                    reviewees = await distribution.get_reviewees(
+                        interaction.guild_id, assignment["name"], team_result["name"]
+                    )
+                    if reviewees:
+                        peer_reviews[assignment["name"]] = reviewees
+
+            if team_result and not peer_reviews:
+                embed = embeds.make_embed(
+                    color=discord.Color.red(),
+                    thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                    title="Error",
+                    description="Peer review distribution for teams has not been performed yet. Please check back later!",
+                    timestamp=True,
+                )
+                return embed, view
+
+            assignment_source = pagination.ListSource(list(peer_reviews))
+            # Each assignment has its own distribution, the pair is checked on selection.
+            team_source = pagination.ListSource(
+                list(
+                    {team for reviewees in peer_reviews.values() for team in reviewees}
+                )
+            )
         else:
-            assignment_options = [
-                discord.SelectOption(label=assignment["name"])
-                for assignment in assignment_results
-            ]
-            team_options = [
-                discord.SelectOption(label=team["name"])
-                for team in team_collection.find({"guild_id": interaction.guild_id})
-            ]
-
-        if not assignment_options:
+            query = {"guild_id": interaction.guild_id}
+            assignment_source = pagination.QuerySource("assignments", query)
+            team_source = pagination.QuerySource("teams", query)
+
+        assignment_dropdown = GradeDropdown(
+            source=assignment_source, name="assignments", custom_id="grade_assignment"
+        )
+        team_dropdown = GradeDropdown(
+            source=team_source, name="teams", custom_id="grade_team"
+        )
+
+        if not await assignment_dropdown.load():
             embed = embeds.make_embed(
                 color=discord.Color.red(),
                 thumbnail_url="https://i.imgur.com/boVVFnQ.png",
@@ -157,7 +238,7 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
             )
             return embed, view
 
-        if not team_options:
+        if not await team_dropdown.load():
             embed = embeds.make_embed(
                 color=discord.Color.red(),
                 thumbnail_url="https://i.imgur.com/boVVFnQ.png",
@@ -167,8 +248,8 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
             )
             return embed, view
 
-        view.add_item(GradeDropdown(options=assignment_options))
-        view.add_item(GradeDropdown(options=team_options))
+        assignment_dropdown.add_to(view, row=0)
+        team_dropdown.add_to(view, row=2)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -185,6 +266,55 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
         embed, view = await self.grade_view(interaction)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @peer_review.command(name="export", description="Export all grades as CSV.")
+    async def export(self, interaction: discord.Interaction) -> None:
+        embed = await helpers.instructor_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.response.send_message(embed=embed, ephemeral=True)
+
+        await interaction.response.defer(ephemeral=True)
+        try:
+            path = await grades.export(interaction.guild_id)
+        except (PyMongoError, OSError) as error:
+            log.error(
+                f"Unable to export grades of guild {interaction.guild_id}: {error}"
+            )
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="Unable to export the grades. Please try again later!",
+                timestamp=True,
+            )
+            return await interaction.followup.send(embed=embed, ephemeral=True)
+
+        embed = embeds.make_embed(
+            interaction=interaction,
+            color=discord.Color.green(),
+            thumbnail_url="https://i.imgur.com/W7VJssL.png",
+            title="Grades exported",
+            description="One row per grade. Instructor grades have no reviewer.",
+            timestamp=True,
+        )
+        try:
+            file = discord.File(path, filename="grades.csv")
+            await interaction.followup.send(embed=embed, file=file, ephemeral=True)
+        except discord.HTTPException as error:
+            # Most likely the file is larger than Discord allows for attachments.
+            log.error(f"Unable to send grades of guild {interaction.guild_id}: {error}")
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=f"Unable to send the exported grades: {error.text}",
+                timestamp=True,
+            )
+            await interaction.followup.send(embed=embed, ephemeral=True)
+        finally:
+            await executor.filesystem.run(path.unlink, missing_ok=True)
+
     @peer_review.command(
         name="download", description="Download peer reviews for an assignment."
     )
@@ -196,20 +326,16 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
             timestamp=True,
         )
 
-        collection = database.Database().get_collection("assignments")
-        query = {"guild_id": interaction.guild_id}
-        assignments = [item for item in collection.find(query).sort("name")]
-        options = [
-            discord.SelectOption(label=assignment["name"])
-            for assignment in assignments
-            if assignment["peer_review"]
-        ]
+        source = pagination.QuerySource(
+            "assignments", {"guild_id": interaction.guild_id, "peer_review": True}
+        )
+        dropdown = DownloadDropdown(source=source)
 
         view = discord.ui.View()
 
-        if options:
+        if await dropdown.load():
             embed.description = "Use the dropdown below to select an assignment you want to download peer reviews from."
-            view.add_item(DownloadDropdown(options=options))
+            dropdown.add_to(view)
         else:
             embed.description = (
                 "No assignments are available at the moment. Please check back later!"
@@ -219,9 +345,17 @@ class PeerReviewCog(commands.GroupCog, group_name="peer"):
 
 
 class DistributeConfirmButtons(discord.ui.View):
-    def __init__(self, peer_reviews: dict, peer_review_string: str) -> None:
+    def __init__(
+        self,
+        assignment: str,
+        strategy: str,
+        result: distribution.Distribution,
+        peer_review_string: str,
+    ) -> None:
         super().__init__()
-        self.peer_reviews = peer_reviews
+        self.assignment = assignment
+        self.strategy = strategy
+        self.result = result
         self.peer_review_string = peer_review_string
 
     @discord.ui.button(
@@ -230,27 +364,21 @@ class DistributeConfirmButtons(discord.ui.View):
     async def confirm(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ) -> None:
-        collection = database.Database().get_collection("teams")
-        query = {"guild_id": interaction.guild_id}
-        results = collection.find(query)
-
-        for result in results:
-            if result["name"] in self.peer_reviews:
-                peer_review = (
-                    self.peer_reviews[result["name"]]
-                    if result["name"] in self.peer_reviews
-                    else None
-                )
-                temp_query = {"guild_id": interaction.guild_id, "name": result["name"]}
-                new_value = {"$set": {"peer_review": peer_review}}
-                collection.update_one(temp_query, new_value)
+        # The whole distribution is one document, so it replaces the previous version
+        # of this assignment atomically.
+        await distribution.save(
+            guild_id=interaction.guild_id,
+            assignment=self.assignment,
+            distribution=self.result,
+            strategy=self.strategy,
+        )
 
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
             thumbnail_url="https://i.imgur.com/oPlYcu6.png",
             title="Peer review distributed",
-            description=f"Successfully distributed peer review teams as following:\n\n"
+            description=f"Successfully distributed peer review teams for **{self.assignment}** as following:\n\n"
             f"{self.peer_review_string}",
             timestamp=True,
         )
@@ -273,33 +401,68 @@ class DistributeConfirmButtons(discord.ui.View):
         await interaction.response.edit_message(embed=embed, view=None)
 
 
-class GradeDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]) -> None:
-        super().__init__()
-        self.options = options
+class GradeDropdown(pagination.PaginatedSelect):
+    def __init__(
+        self,
+        source: pagination.QuerySource | pagination.ListSource,
+        name: str,
+        custom_id: str,
+    ) -> None:
+        super().__init__(source=source, name=name, custom_id=custom_id)
         self.value = None
 
     async def callback(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer()
         self.value = self.values[0]
 
-        assignment = self.view.children[0].value
-        team = self.view.children[1].value
+        dropdowns = {
+            children.custom_id: children
+            for children in self.view.children
+            if isinstance(children, GradeDropdown)
+        }
+        assignment = dropdowns["grade_assignment"].value
+        team = dropdowns["grade_team"].value
         if not assignment or not team:
             return
 
-        grade_collection = database.Database().get_collection("grades")
-        grade_query = {
-            "guild_id": interaction.guild_id,
-            "name": assignment,
-            "team": team,
-        }
-        grade_result = grade_collection.find_one(grade_query)
+        # Students grade as their team, instructors give the instructor grade.
+        reviewer = None
+        check = await helpers.instructor_check(interaction)
+        if isinstance(check, discord.Embed):
+            team_collection = database.Database().get_collection("teams")
+            team_query = {
+                "guild_id": interaction.guild_id,
+                "members": interaction.user.id,
+            }
+            team_result = await team_collection.find_one(team_query)
+            reviewer = team_result["name"]
+            reviewees = await distribution.get_reviewees(
+                interaction.guild_id, assignment, team_result["name"]
+            )
+            if team not in reviewees:
+                embed = embeds.make_embed(
+                    interaction=interaction,
+                    color=discord.Color.red(),
+                    thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                    title="Error",
+                    description=f"Your team is not assigned to review **{team}** for **{assignment}**.",
+                    timestamp=True,
+                )
+                view = discord.ui.View()
+                view.add_item(GradeBackButton())
+                return await interaction.edit_original_response(embed=embed, view=view)
+
+        grade_result = await grades.get_grade(
+            guild_id=interaction.guild_id,
+            assignment=assignment,
+            team=team,
+            reviewer=reviewer,
+        )
         current_points = grade_result["points"] if grade_result else 0
 
         assignment_collection = database.Database().get_collection("assignments")
         assignment_query = {"guild_id": interaction.guild_id, "name": assignment}
-        assignment_result = assignment_collection.find_one(assignment_query)
+        assignment_result = await assignment_collection.find_one(assignment_query)
         max_points = assignment_result["points"]
 
         embed = embeds.make_embed(
@@ -319,9 +482,21 @@ class GradeDropdown(discord.ui.Select):
             timestamp=True,
         )
 
+        # Instructors also see the score calibrated from every peer review of the team.
+        if reviewer is None:
+            score = await scoring.get_score(interaction.guild_id, assignment, team)
+            value = "Not graded by peers yet."
+            if score and score["score"] is not None:
+                value = (
+                    f"{score['score']:.1f}/{max_points} from {score['reviews']} peer reviews"
+                    f", {len(score['outliers'])} ignored as outliers."
+                )
+            embed.add_field(name="Calibrated Score:", value=value, inline=False)
+
         grade_update_button = GradeUpdateButton(
             assignment=assignment,
             team=team,
+            reviewer=reviewer,
             current_points=current_points,
             max_points=max_points,
         )
@@ -347,7 +522,12 @@ class GradeBackButton(discord.ui.Button):
 
 class GradeUpdateButton(discord.ui.Button):
     def __init__(
-        self, assignment: str, team: str, current_points: int, max_points: int
+        self,
+        assignment: str,
+        team: str,
+        reviewer: str | None,
+        current_points: int,
+        max_points: int,
     ) -> None:
         super().__init__()
         self.label = "Update Grade"
@@ -355,6 +535,7 @@ class GradeUpdateButton(discord.ui.Button):
         self.custom_id = "grade_update"
         self.assignment = assignment
         self.team = team
+        self.reviewer = reviewer
         self.current_points = current_points
         self.max_points = max_points
 
@@ -363,6 +544,7 @@ class GradeUpdateButton(discord.ui.Button):
             GradeUpdateModal(
                 assignment=self.assignment,
                 team=self.team,
+                reviewer=self.reviewer,
                 current_points=self.current_points,
                 max_points=self.max_points,
             )
@@ -371,11 +553,17 @@ class GradeUpdateButton(discord.ui.Button):
 
 class GradeUpdateModal(discord.ui.Modal, title="Update Grade"):
     def __init__(
-        self, assignment: str, team: str, current_points: int, max_points: int
+        self,
+        assignment: str,
+        team: str,
+        reviewer: str | None,
+        current_points: int,
+        max_points: int,
     ) -> None:
         super().__init__()
         self.assignment = assignment
         self.team = team
+        self.reviewer = reviewer
         self.current_points = current_points
         self.max_points = max_points
         self.points = discord.ui.TextInput(
@@ -389,25 +577,32 @@ class GradeUpdateModal(discord.ui.Modal, title="Update Grade"):
         self.add_item(self.points)
 
     async def on_submit(self, interaction: discord.Interaction) -> None:
-        new_points = int(self.points.value)
-        collection = database.Database().get_collection("grades")
-        query = {
-            "guild_id": interaction.guild_id,
-            "assignment": self.assignment,
-            "team": self.team,
-        }
-        result = collection.find_one(query)
-        if result:
-            new_value = {"$set": {"points": new_points}}
-            collection.update_one(query, new_value, upsert=True)
-        else:
-            document = {
-                "guild_id": interaction.guild_id,
-                "name": self.assignment,
-                "team": self.team,
-                "points": new_points,
-            }
-            collection.insert_one(document)
+        try:
+            new_points = int(self.points.value)
+        except ValueError:
+            new_points = None
+
+        if new_points is None or not 0 <= new_points <= self.max_points:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=f"Points must be a whole number between 0 and {self.max_points}.",
+                timestamp=True,
+            )
+            view = discord.ui.View()
+            view.add_item(GradeBackButton())
+            return await interaction.response.edit_message(embed=embed, view=view)
+
+        await grades.set_grade(
+            guild_id=interaction.guild_id,
+            assignment=self.assignment,
+            team=self.team,
+            reviewer=self.reviewer,
+            points=new_points,
+            graded_by=interaction.user.id,
+        )
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -449,10 +644,9 @@ class GradeUpdateModal(discord.ui.Modal, title="Update Grade"):
         await interaction.response.edit_message(embed=embed, view=view)
 
 
-class DownloadDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]) -> None:
-        super().__init__()
-        self.options = options
+class DownloadDropdown(pagination.PaginatedSelect):
+    def __init__(self, source: pagination.QuerySource) -> None:
+        super().__init__(source=source)
 
     async def callback(
         self, interaction: discord.Interaction
@@ -471,57 +665,47 @@ class DownloadDropdown(discord.ui.Select):
 
         collection = database.Database().get_collection("teams")
         query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        result = collection.find_one(query)
-
-        def task() -> list[str]:
-            root = pathlib.Path(__file__).parents[3]
-            links = []
-            for index, team in enumerate(result["peer_review"]):
-                file_dir = root.joinpath(
-                    "uploads",
-                    str(interaction.guild_id),
-                    "submissions",
-                    team,
-                    self.values[0],
-                ).glob("**/*")
-                for item in file_dir:
-                    if not item.is_file():
-                        continue
-
-                    file = item.open(mode="rb")
-                    mime_type = magic.from_buffer(file.read(2048), mime=True)
-                    file.seek(0)
-                    fields = {
-                        "time": "1h",
-                        "reqtype": "fileupload",
-                        "fileToUpload": (item.name, file, mime_type),
+        result = await collection.find_one(query)
+
+        teams = await distribution.get_reviewees(
+            interaction.guild_id, self.values[0], result["name"]
+        )
+        bundle = await bundles.get_bundle(
+            guild_id=interaction.guild_id, assignment=self.values[0], teams=teams
+        )
+
+        def make_embed(value: str | None) -> discord.Embed:
+            return embeds.make_embed(
+                interaction=interaction,
+                thumbnail_url="https://i.imgur.com/o2yYOnK.png",
+                title="Peer reviews",
+                description="Use the dropdown below to select an assignment you want to download peer reviews from.",
+                fields=[
+                    {
+                        "name": f"{self.values[0]}:",
+                        "value": f"{value}",
+                        "inline": False,
                     }
-                    encoder = MultipartEncoder(fields=fields)
-                    response = requests.post(
-                        url="https://litterbox.catbox.moe/resources/internals/api.php",
-                        data=encoder,
-                        headers={"Content-Type": encoder.content_type},
-                    )
-                    links.append(f"{index + 1}. {team}: [Download]({response.text})")
-            return links
+                ],
+            )
 
-        hyperlinks_list = await asyncio.to_thread(task)
-        hyperlinks = "\n".join(hyperlinks_list)
+        value = None
+        if bundle:
+            team_list = "\n".join(
+                f"{index + 1}. {team}" for index, team in enumerate(teams)
+            )
+            [pending] = storage.hyperlinks([None], done=False)
+            await interaction.edit_original_response(
+                embed=make_embed(f"{team_list}\n\n{pending}")
+            )
 
-        embed = embeds.make_embed(
-            interaction=interaction,
-            thumbnail_url="https://i.imgur.com/o2yYOnK.png",
-            title="Peer reviews",
-            description="Use the dropdown below to select an assignment you want to download peer reviews from.",
-            fields=[
-                {
-                    "name": f"{self.values[0]}:",
-                    "value": f"{hyperlinks if hyperlinks else None}",
-                    "inline": False,
-                }
-            ],
-        )
+            links = await storage.backend.get_links(
+                [bundle], mime_types=["application/zip"]
+            )
+            [hyperlink] = storage.hyperlinks(links)
+            value = f"{team_list}\n\n{hyperlink}"
 
+        embed = make_embed(value)
         await interaction.edit_original_response(embed=embed, view=self.view)
 
 
@@ -5,7 +5,7 @@ import discord
 from discord import app_commands
 from discord.ext import commands
 
-from modules.utils import database, embeds, helpers
+from modules.utils import cooldown, database, embeds, helpers
 
 log = logging.getLogger(__name__)
 
@@ -17,9 +17,7 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
     @app_commands.command(name="role", description="Setup the professor role.")
     @app_commands.checks.has_permissions(manage_roles=True)
     async def role(self, interaction: discord.Interaction, role: discord.Role) -> None:
-        collection = database.Database().get_collection("settings")
-        query = {"guild_id": interaction.guild_id}
-        result = collection.find_one(query)
+        result = await helpers.get_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -63,7 +61,7 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
 
         cooldown_collection = database.Database().get_collection("cooldown")
         cooldown_query = {"guild_id": interaction.guild_id}
-        cooldown_result = cooldown_collection.find_one(cooldown_query)
+        cooldown_result = await cooldown_collection.find_one(cooldown_query)
         if cooldown_result is None:
             commands_list = ["team rename"]
             for command in commands_list:
@@ -73,7 +71,10 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
                     "rate": 1,
                     "per": 1,
                 }
-                cooldown_collection.insert_one(document)
+                await cooldown_collection.insert_one(document)
+                cooldown.manager.set_limit(
+                    guild_id=interaction.guild_id, command=command, rate=1, per=1
+                )
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -82,9 +83,9 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
             title="Command cooldown",
             description="Use the dropdown below to select a command and set a cooldown for it.",
         )
-        cooldown_results = cooldown_collection.find(cooldown_query)
         options = [
-            discord.SelectOption(label=result["command"]) for result in cooldown_results
+            discord.SelectOption(label=result["command"])
+            async for result in cooldown_collection.find(cooldown_query)
         ]
         view = discord.ui.View()
         view.add_item(CooldownDropdown(options))
@@ -98,9 +99,7 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        collection = database.Database().get_collection("settings")
-        query = {"guild_id": interaction.guild_id}
-        result = collection.find_one(query)
+        result = await helpers.get_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -121,9 +120,7 @@ class SettingsCog(commands.GroupCog, group_name="settings"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        collection = database.Database().get_collection("settings")
-        query = {"guild_id": interaction.guild_id}
-        result = collection.find_one(query)
+        result = await helpers.get_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -153,7 +150,7 @@ class RoleConfirmButtons(discord.ui.View):
         query = {"guild_id": interaction.guild_id}
         if self.result:
             new_value = {"$set": {"role_id": self.role.id}}
-            collection.update_one(query, new_value)
+            await collection.update_one(query, new_value)
         else:
             document = {
                 "guild_id": interaction.guild_id,
@@ -162,7 +159,9 @@ class RoleConfirmButtons(discord.ui.View):
                 "peer_review_size": 1,
                 "teams_locked": False,
             }
-            collection.insert_one(document)
+            await collection.insert_one(document)
+
+        helpers.invalidate_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -203,7 +202,8 @@ class TeamSizeConfirmButtons(discord.ui.View):
         collection = database.Database().get_collection("settings")
         query = {"guild_id": interaction.guild_id}
         new_value = {"$set": {"team_size": self.size}}
-        collection.update_one(query, new_value)
+        await collection.update_one(query, new_value)
+        helpers.invalidate_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -246,7 +246,8 @@ class PeerReviewSizeConfirmButtons(discord.ui.View):
         collection = database.Database().get_collection("settings")
         query = {"guild_id": interaction.guild_id}
         new_value = {"$set": {"peer_review_size": self.size}}
-        collection.update_one(query, new_value)
+        await collection.update_one(query, new_value)
+        helpers.invalidate_settings(interaction.guild_id)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -283,7 +284,7 @@ class CooldownDropdown(discord.ui.Select):
     async def callback(self, interaction: discord.Interaction) -> None:
         collection = database.Database().get_collection("cooldown")
         query = {"guild_id": interaction.guild_id, "command": self.values[0]}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         cooldown_modal = CooldownModal(
             command=result["command"],
@@ -334,7 +335,10 @@ class CooldownModal(discord.ui.Modal, title="Cooldown"):
             return await interaction.response.edit_message(embed=embed, view=None)
 
         new_value = {"$set": {"rate": rate, "per": per}}
-        collection.update_one(query, new_value)
+        await collection.update_one(query, new_value)
+        cooldown.manager.set_limit(
+            guild_id=interaction.guild_id, command=self.command, rate=rate, per=per
+        )
 
         command_tokens = self.command.split()
         command = await helpers.get_command(
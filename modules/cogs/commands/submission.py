@@ -1,17 +1,22 @@
-import asyncio
 import logging
 import pathlib
 from typing import List
 
 import arrow
 import discord
-import magic
-import requests
 from discord import app_commands
 from discord.ext import commands
-from requests_toolbelt import MultipartEncoder
 
-from modules.utils import database, embeds, helpers
+from modules.utils import (
+    autocomplete,
+    database,
+    embeds,
+    helpers,
+    ingest,
+    metadata,
+    pagination,
+    storage,
+)
 
 log = logging.getLogger(__name__)
 
@@ -31,18 +36,16 @@ class SubmissionCog(commands.GroupCog, group_name="submission"):
             timestamp=True,
         )
 
-        collection = database.Database().get_collection("assignments")
-        query = {"guild_id": interaction.guild_id}
-        assignments = [item for item in collection.find(query).sort("name")]
-        options = [
-            discord.SelectOption(label=assignment["name"]) for assignment in assignments
-        ]
+        source = pagination.QuerySource(
+            "assignments", {"guild_id": interaction.guild_id}
+        )
+        dropdown = SubmissionDropdown(source=source)
 
         view = discord.ui.View()
 
-        if options:
+        if await dropdown.load():
             embed.description = "Use the dropdown below to select an assignment and view your submissions."
-            view.add_item(SubmissionDropdown(options=options))
+            dropdown.add_to(view)
         else:
             embed.description = (
                 "No assignments are available at the moment. Please check back later!"
@@ -75,7 +78,7 @@ class SubmissionCog(commands.GroupCog, group_name="submission"):
 
         assignment_collection = database.Database().get_collection("assignments")
         assignment_query = {"guild_id": interaction.guild_id, "name": assignment}
-        assignment_result = assignment_collection.find_one(assignment_query)
+        assignment_result = await assignment_collection.find_one(assignment_query)
 
         if assignment_result is None:
             embed = embeds.make_embed(
@@ -102,7 +105,7 @@ class SubmissionCog(commands.GroupCog, group_name="submission"):
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        team_result = team_collection.find_one(team_query)
+        team_result = await team_collection.find_one(team_query)
 
         file_dir = (
             pathlib.Path(__file__)
@@ -115,17 +118,31 @@ class SubmissionCog(commands.GroupCog, group_name="submission"):
                 assignment,
             )
         )
-        file_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            replaced = await ingest.ingest(
+                attachment, interaction.guild_id, file_dir, interaction.user.id
+            )
+        except ingest.IngestError as error:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            return await interaction.edit_original_response(embed=embed)
 
-        file_path = file_dir.joinpath(attachment.filename)
-        await attachment.save(file_path)
+        description = f"Successfully submitted assignment '{assignment}'."
+        if replaced:
+            description += f" It replaced the previous '{attachment.filename}'."
 
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
             title="Assignment submitted",
-            description=f"Successfully submitted assignment '{assignment}'.",
+            description=description,
             timestamp=True,
         )
 
@@ -135,25 +152,21 @@ class SubmissionCog(commands.GroupCog, group_name="submission"):
     async def upload_autocomplete(
         self, interaction: discord.Interaction, current: str
     ) -> List[app_commands.Choice[str]]:
-        collection = database.Database().get_collection("assignments")
-        query = {"guild_id": interaction.guild_id}
         current_timestamp = arrow.Arrow.utcnow().timestamp()
-        assignments = [
-            result["name"]
-            for result in collection.find(query).sort("name")
-            if current_timestamp <= result["due_date"]
-        ]
+        assignments = await autocomplete.assignments.search(
+            guild_id=interaction.guild_id,
+            current=current,
+            predicate=lambda assignment: current_timestamp <= assignment.due_date,
+        )
         return [
             app_commands.Choice(name=assignment, value=assignment)
             for assignment in assignments
-            if current.lower() in assignment.lower()
         ]
 
 
-class SubmissionDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]) -> None:
-        super().__init__()
-        self.options = options
+class SubmissionDropdown(pagination.PaginatedSelect):
+    def __init__(self, source: pagination.QuerySource) -> None:
+        super().__init__(source=source)
 
     async def callback(self, interaction: discord.Interaction) -> None:
         await interaction.response.defer()
@@ -166,45 +179,21 @@ class SubmissionDropdown(discord.ui.Select):
 
         assignment_collection = database.Database().get_collection("assignments")
         assignment_query = {"guild_id": interaction.guild_id, "name": self.values[0]}
-        assignment_result = assignment_collection.find_one(assignment_query)
+        assignment_result = await assignment_collection.find_one(assignment_query)
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        team_result = team_collection.find_one(team_query)
-
-        def task() -> list[str]:
-            root = pathlib.Path(__file__).parents[3]
-            file_dir = root.joinpath(
-                "uploads",
-                str(interaction.guild_id),
-                "submissions",
-                team_result["name"],
-                self.values[0],
-            ).glob("**/*")
-            links = []
-            for item in file_dir:
-                if not item.is_file():
-                    continue
-
-                file = item.open(mode="rb")
-                mime_type = magic.from_buffer(file.read(2048), mime=True)
-                file.seek(0)
-                fields = {
-                    "time": "1h",
-                    "reqtype": "fileupload",
-                    "fileToUpload": (item.name, file, mime_type),
-                }
-                encoder = MultipartEncoder(fields=fields)
-                response = requests.post(
-                    url="https://litterbox.catbox.moe/resources/internals/api.php",
-                    data=encoder,
-                    headers={"Content-Type": encoder.content_type},
-                )
-                links.append(f"[Download]({response.text})")
-            return links
-
-        hyperlinks_list = await asyncio.to_thread(task)
-        hyperlinks = "\n".join(hyperlinks_list)
+        team_result = await team_collection.find_one(team_query)
+
+        root = pathlib.Path(__file__).parents[3]
+        file_dir = root.joinpath(
+            "uploads",
+            str(interaction.guild_id),
+            "submissions",
+            team_result["name"],
+            self.values[0],
+        )
+        files = await metadata.get_files(interaction.guild_id, file_dir)
 
         due_date = arrow.Arrow.fromtimestamp(
             assignment_result["due_date"], tzinfo="EST"
@@ -213,37 +202,50 @@ class SubmissionDropdown(discord.ui.Select):
             f"{due_date.format('MM/DD/YYYY, hh:mmA')} ({due_date.tzname()})"
         )
 
-        embed = embeds.make_embed(
-            interaction=interaction,
-            thumbnail_url="https://i.imgur.com/HcZHHdQ.png",
-            title="Assignments",
-            description="Use the dropdown below to select an assignment and view your submissions.",
-            fields=[
-                {
-                    "name": "Assignment Name:",
-                    "value": assignment_result["name"],
-                    "inline": False,
-                },
-                {
-                    "name": "Points Possible:",
-                    "value": assignment_result["points"],
-                    "inline": False,
-                },
-                {"name": "Due Date:", "value": duration_string, "inline": False},
-                {
-                    "name": "Instructions:",
-                    "value": assignment_result["instructions"],
-                    "inline": False,
-                },
-                {
-                    "name": "Your Submissions:",
-                    "value": f"{hyperlinks if hyperlinks else None}",
-                    "inline": False,
-                },
-            ],
-            timestamp=True,
-        )
+        def make_embed(hyperlinks_list: list[str]) -> discord.Embed:
+            hyperlinks = "\n".join(hyperlinks_list)
+            return embeds.make_embed(
+                interaction=interaction,
+                thumbnail_url="https://i.imgur.com/HcZHHdQ.png",
+                title="Assignments",
+                description="Use the dropdown below to select an assignment and view your submissions.",
+                fields=[
+                    {
+                        "name": "Assignment Name:",
+                        "value": assignment_result["name"],
+                        "inline": False,
+                    },
+                    {
+                        "name": "Points Possible:",
+                        "value": assignment_result["points"],
+                        "inline": False,
+                    },
+                    {"name": "Due Date:", "value": duration_string, "inline": False},
+                    {
+                        "name": "Instructions:",
+                        "value": assignment_result["instructions"],
+                        "inline": False,
+                    },
+                    {
+                        "name": "Your Submissions:",
+                        "value": f"{hyperlinks if hyperlinks else None}",
+                        "inline": False,
+                    },
+                ],
+                timestamp=True,
+            )
 
+        async def on_update(links: list[str | None]) -> None:
+            await interaction.edit_original_response(
+                embed=make_embed(storage.hyperlinks(links, done=False))
+            )
+
+        links = await storage.backend.get_links(
+            [metadata.local_path(file) for file in files],
+            on_update=on_update,
+            mime_types=[file["mime_type"] for file in files],
+        )
+        embed = make_embed(storage.hyperlinks(links))
         await interaction.edit_original_response(embed=embed, view=self.view)
 
 
@@ -3,11 +3,25 @@ import logging
 import discord
 from discord import app_commands
 from discord.ext import commands
-
-from modules.utils import database, embeds, helpers
+from pymongo.errors import DuplicateKeyError
+
+from modules.utils import (
+    cooldown,
+    database,
+    distribution,
+    embeds,
+    grades,
+    helpers,
+    membership,
+    pagination,
+    roster,
+)
 
 log = logging.getLogger(__name__)
 
+# Keeps the team list well under the embed description limit.
+TEAMS_PER_PAGE = 25
+
 
 class TeamCog(commands.GroupCog, group_name="team"):
     def __init__(self, bot: commands.Bot) -> None:
@@ -25,7 +39,7 @@ class TeamCog(commands.GroupCog, group_name="team"):
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "name": name}
-        team_result = team_collection.find_one(team_query)
+        team_result = await team_collection.find_one(team_query)
         if team_result and team_result["name"] in (name, name.lower()):
             embed = embeds.make_embed(
                 interaction=interaction,
@@ -37,20 +51,19 @@ class TeamCog(commands.GroupCog, group_name="team"):
             )
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        results = team_collection.find()
-        for document in results:
-            if interaction.user.id in document["members"]:
-                embed = embeds.make_embed(
-                    interaction=interaction,
-                    color=discord.Color.red(),
-                    thumbnail_url="https://i.imgur.com/boVVFnQ.png",
-                    title="Error",
-                    description="You cannot create a new team because you are already in a team.",
-                    timestamp=True,
-                )
-                return await interaction.response.send_message(
-                    embed=embed, ephemeral=True
-                )
+        current_team = await membership.index.get_team(
+            guild_id=interaction.guild_id, user_id=interaction.user.id
+        )
+        if current_team:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="You cannot create a new team because you are already in a team.",
+                timestamp=True,
+            )
+            return await interaction.response.send_message(embed=embed, ephemeral=True)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -77,30 +90,24 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return embed, view
 
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        settings_result = await helpers.get_settings(interaction.guild_id)
 
-        team_collection = database.Database().get_collection("teams")
+        current_team = await membership.index.get_team(
+            guild_id=interaction.guild_id, user_id=interaction.user.id
+        )
 
-        current_team_query = {
+        # Teams that are not full have no member at index team_size - 1.
+        new_team_query = {
             "guild_id": interaction.guild_id,
-            "members": interaction.user.id,
+            "name": {"$ne": current_team},
+            f"members.{settings_result['team_size'] - 1}": {"$exists": False},
         }
-        current_team_result = team_collection.find_one(current_team_query)
-
-        new_team_query = {"guild_id": interaction.guild_id}
-        new_team_results = team_collection.find(new_team_query)
-
-        options = []
-        for result in new_team_results:
-            if current_team_result and current_team_result["name"] == result["name"]:
-                continue
-
-            if len(result["members"]) < settings_result["team_size"]:
-                options.append(discord.SelectOption(label=result["name"]))
+        dropdown = JoinTeamDropdown(
+            source=pagination.QuerySource("teams", new_team_query),
+            current_team=current_team,
+        )
 
-        if not options:
+        if not await dropdown.load():
             command = await helpers.get_command(
                 interaction=interaction, command="team", subcommand_group="view"
             )
@@ -114,14 +121,7 @@ class TeamCog(commands.GroupCog, group_name="team"):
             )
             return embed, view
 
-        view.add_item(
-            JoinTeamDropdown(
-                options=options,
-                current_team=current_team_result["name"]
-                if current_team_result
-                else None,
-            )
-        )
+        dropdown.add_to(view)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -148,11 +148,11 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        team_collection = database.Database().get_collection("teams")
-        team_query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        team_result = team_collection.find_one(team_query)
+        current_team = await membership.index.get_team(
+            guild_id=interaction.guild_id, user_id=interaction.user.id
+        )
 
-        if team_result is None:
+        if current_team is None:
             embed = embeds.make_embed(
                 interaction=interaction,
                 color=discord.Color.red(),
@@ -168,14 +168,10 @@ class TeamCog(commands.GroupCog, group_name="team"):
             color=discord.Color.yellow(),
             thumbnail_url="https://i.imgur.com/s1sRlvc.png",
             title="Warning",
-            description=f"You are currently in the team '{team_result['name']}'. Do you wish to leave?",
+            description=f"You are currently in the team '{current_team}'. Do you wish to leave?",
         )
         await interaction.response.send_message(
-            embed=embed,
-            view=LeaveTeamConfirmButtons(
-                name=team_result["name"], channel_id=team_result["channel_id"]
-            ),
-            ephemeral=True,
+            embed=embed, view=LeaveTeamConfirmButtons(), ephemeral=True
         )
 
     @app_commands.command(name="view", description="View a list of all teams.")
@@ -188,13 +184,41 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        embed, view = await self.list_view(interaction, page=0)
+        await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @staticmethod
+    async def list_view(
+        interaction: discord.Interaction, page: int
+    ) -> tuple[discord.Embed, discord.ui.View]:
+        settings_result = await helpers.get_settings(interaction.guild_id)
+
+        # Only the requested page, member counts and the caller's team are sent back, never
+        # the member arrays themselves.
         team_collection = database.Database().get_collection("teams")
-        team_query = {"guild_id": interaction.guild_id}
-        team_result = team_collection.find(team_query)
+        pipeline = [
+            {"$match": {"guild_id": interaction.guild_id}},
+            {"$sort": {"name": 1}},
+            {
+                "$facet": {
+                    "total": [{"$count": "count"}],
+                    "teams": [
+                        {"$skip": page * TEAMS_PER_PAGE},
+                        {"$limit": TEAMS_PER_PAGE},
+                        {
+                            "$project": {
+                                "_id": 0,
+                                "name": 1,
+                                "size": {"$size": "$members"},
+                                "current": {"$in": [interaction.user.id, "$members"]},
+                            }
+                        },
+                    ],
+                }
+            },
+        ]
+        [result] = await team_collection.aggregate(pipeline).to_list()
+        total = result["total"][0]["count"] if result["total"] else 0
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -203,43 +227,40 @@ class TeamCog(commands.GroupCog, group_name="team"):
             footer="Your current team will be marked in bold.",
             timestamp=True,
         )
+        view = discord.ui.View()
 
-        if team_result is None:
+        if not total:
             embed.description = "No teams were found. Please try again later!"
-            return await interaction.response.send_message(embed=embed, ephemeral=True)
+            return embed, view
 
-        current_team_query = {
-            "guild_id": interaction.guild_id,
-            "members": interaction.user.id,
-        }
-        current_team_result = team_collection.find_one(current_team_query)
+        pages = -(-total // TEAMS_PER_PAGE)
+        # Teams may have been removed since the previous page was shown.
+        if page >= pages:
+            return await TeamCog.list_view(interaction, page=pages - 1)
 
         check = await helpers.instructor_check(interaction)
         instructor = False if isinstance(check, discord.Embed) else True
 
         teams = []
-        for index, value in enumerate(team_result):
+        for index, value in enumerate(result["teams"], start=page * TEAMS_PER_PAGE):
             if instructor:
-                teams.append(
-                    f"{index + 1}. {value['name']} ({len(value['members'])}/{settings_result['team_size']})"
-                )
-                continue
-
-            if len(value["members"]) >= settings_result["team_size"]:
-                teams.append(f"{index + 1}. {value['name']} (full)")
+                line = f"{index + 1}. {value['name']} ({value['size']}/{settings_result['team_size']})"
+            elif value["size"] >= settings_result["team_size"]:
+                line = f"{index + 1}. {value['name']} (full)"
             else:
-                teams.append(f"{index + 1}. {value['name']}")
+                line = f"{index + 1}. {value['name']}"
+            teams.append(f"**{line}**" if value["current"] else line)
 
-        if not current_team_result:
-            embed.description = "\n".join(teams)
-            return await interaction.response.send_message(embed=embed, ephemeral=True)
+        embed.description = "\n".join(teams)
 
-        for index, value in enumerate(teams):
-            if current_team_result["name"] in value:
-                teams[index] = f"**{value}**"
+        if pages > 1:
+            embed.description += f"\n\nPage {page + 1} of {pages}."
+            view.add_item(TeamListPageButton(page=page - 1, label="Previous"))
+            view.add_item(TeamListPageButton(page=page + 1, label="Next"))
+            view.children[0].disabled = page == 0
+            view.children[1].disabled = page + 1 >= pages
 
-        embed.description = "\n".join(teams)
-        await interaction.response.send_message(embed=embed, ephemeral=True)
+        return embed, view
 
     @app_commands.command(name="rename", description="Rename a team.")
     async def rename(self, interaction: discord.Interaction):
@@ -252,14 +273,14 @@ class TeamCog(commands.GroupCog, group_name="team"):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
         embed = await helpers.cooldown_check(
-            interaction=interaction, command="team rename"
+            interaction=interaction, command="team rename", consume=False
         )
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
         collection = database.Database().get_collection("teams")
         query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
         if result is None:
             embed = embeds.make_embed(
                 interaction=interaction,
@@ -304,12 +325,8 @@ class TeamCog(commands.GroupCog, group_name="team"):
             )
             return embed, view
 
-        collection = database.Database().get_collection("teams")
-        query = {"guild_id": interaction.guild_id}
-        options = [
-            discord.SelectOption(label=result["name"])
-            for result in collection.find(query)
-        ]
+        source = pagination.QuerySource("teams", {"guild_id": interaction.guild_id})
+        dropdown = EditTeamDropdown(source)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -318,13 +335,13 @@ class TeamCog(commands.GroupCog, group_name="team"):
             timestamp=True,
         )
 
-        if not options:
+        if not await dropdown.load():
             embed.description = "It seems that no teams are available at the moment. Please check back later!"
             return embed, view
 
         embed.description = "Select a team to edit using the dropdown below."
         view = discord.ui.View()
-        view.add_item(EditTeamDropdown(options))
+        dropdown.add_to(view)
         return embed, view
 
     @app_commands.command(name="edit", description="Edit a team.")
@@ -345,12 +362,8 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return embed, view
 
-        collection = database.Database().get_collection("teams")
-        query = {"guild_id": interaction.guild_id}
-        options = [
-            discord.SelectOption(label=result["name"])
-            for result in collection.find(query)
-        ]
+        source = pagination.QuerySource("teams", {"guild_id": interaction.guild_id})
+        dropdown = RemoveTeamDropdown(source)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -359,13 +372,13 @@ class TeamCog(commands.GroupCog, group_name="team"):
             timestamp=True,
         )
 
-        if not options:
+        if not await dropdown.load():
             embed.description = "It seems that no teams are available at the moment. Please check back later!"
             return embed, view
 
         embed.description = "Select a team to remove using the dropdown below."
         view = discord.ui.View()
-        view.add_item(RemoveTeamDropdown(options))
+        dropdown.add_to(view)
         return embed, view
 
     @app_commands.command(name="remove", description="Remove a team.")
@@ -373,6 +386,134 @@ class TeamCog(commands.GroupCog, group_name="team"):
         embed, view = await self.remove_view(interaction)
         await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
+    @app_commands.command(name="import", description="Create teams from a roster.")
+    @app_commands.describe(
+        attachment="CSV file with a team and a member column, and optionally a section column."
+    )
+    async def import_roster(
+        self, interaction: discord.Interaction, attachment: discord.Attachment
+    ):
+        # Reading and checking a large roster can outlast the acknowledgement window.
+        await interaction.response.defer(ephemeral=True)
+
+        embed = await helpers.course_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.followup.send(embed=embed)
+
+        embed = await helpers.instructor_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.followup.send(embed=embed)
+
+        settings_result = await helpers.get_settings(interaction.guild_id)
+        existing, assigned = await roster.get_taken(interaction.guild_id)
+        try:
+            if attachment.size > roster.MAX_ROSTER_SIZE:
+                raise roster.RosterError("The roster is too large.")
+            teams = roster.parse(
+                guild=interaction.guild,
+                data=await attachment.read(),
+                team_size=settings_result["team_size"],
+                existing=existing,
+                assigned=assigned,
+            )
+            if not teams:
+                raise roster.RosterError("The roster does not list any teams.")
+            roster.validate(interaction.guild, teams)
+        except roster.RosterError as error:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            return await interaction.followup.send(embed=embed)
+
+        embed = embeds.make_embed(
+            interaction=interaction,
+            color=discord.Color.yellow(),
+            thumbnail_url="https://i.imgur.com/s1sRlvc.png",
+            title="Import teams",
+            description=f"Create the following {len(teams)} teams?\n\n{roster.preview(teams)}",
+        )
+        await interaction.followup.send(
+            embed=embed, view=ImportTeamsConfirmButtons(teams)
+        )
+
+    @app_commands.command(
+        name="auto", description="Put every student without a team into new teams."
+    )
+    @app_commands.describe(seed="Seed to reproduce a previous partition.")
+    async def auto(
+        self,
+        interaction: discord.Interaction,
+        seed: app_commands.Range[int, 0, 2**32 - 1] = None,
+    ):
+        await interaction.response.defer(ephemeral=True)
+
+        embed = await helpers.course_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.followup.send(embed=embed)
+
+        embed = await helpers.instructor_check(interaction)
+        if isinstance(embed, discord.Embed):
+            return await interaction.followup.send(embed=embed)
+
+        settings_result = await helpers.get_settings(interaction.guild_id)
+        existing, assigned = await roster.get_taken(interaction.guild_id)
+        members = [
+            member
+            for member in interaction.guild.members
+            if not member.bot
+            and member.id not in assigned
+            and not any(role.id == settings_result["role_id"] for role in member.roles)
+        ]
+
+        if not members:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="Every student is already in a team.",
+                timestamp=True,
+            )
+            return await interaction.followup.send(embed=embed)
+
+        teams = roster.partition(
+            members=members,
+            team_size=settings_result["team_size"],
+            existing=existing,
+            seed=seed,
+        )
+        try:
+            roster.validate(interaction.guild, teams)
+        except roster.RosterError as error:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            return await interaction.followup.send(embed=embed)
+
+        embed = embeds.make_embed(
+            interaction=interaction,
+            color=discord.Color.yellow(),
+            thumbnail_url="https://i.imgur.com/s1sRlvc.png",
+            title="Form teams",
+            description=(
+                f"Put {len(members)} students into the following {len(teams)} teams?\n\n"
+                f"{roster.preview(teams)}"
+            ),
+        )
+        await interaction.followup.send(
+            embed=embed, view=ImportTeamsConfirmButtons(teams)
+        )
+
     @app_commands.command(name="lock", description="Lock all teams.")
     async def lock(self, interaction: discord.Interaction):
         embed = await helpers.course_check(interaction)
@@ -383,9 +524,7 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        settings_result = await helpers.get_settings(interaction.guild_id)
         if settings_result["teams_locked"]:
             embed = embeds.make_embed(
                 interaction=interaction,
@@ -422,9 +561,7 @@ class TeamCog(commands.GroupCog, group_name="team"):
         if isinstance(embed, discord.Embed):
             return await interaction.response.send_message(embed=embed, ephemeral=True)
 
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        settings_result = await helpers.get_settings(interaction.guild_id)
         if not settings_result["teams_locked"]:
             embed = embeds.make_embed(
                 interaction=interaction,
@@ -452,6 +589,19 @@ class TeamCog(commands.GroupCog, group_name="team"):
         )
 
 
+class TeamListPageButton(discord.ui.Button):
+    def __init__(self, page: int, label: str) -> None:
+        super().__init__()
+        self.page = page
+        self.label = label
+        self.style = discord.ButtonStyle.gray
+        self.custom_id = f"team_list_{label.lower()}"
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        embed, view = await TeamCog.list_view(interaction, page=max(self.page, 0))
+        await interaction.response.edit_message(embed=embed, view=view)
+
+
 class CreateTeamConfirmButtons(discord.ui.View):
     def __init__(self, name: str) -> None:
         super().__init__()
@@ -465,9 +615,7 @@ class CreateTeamConfirmButtons(discord.ui.View):
     async def confirm(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ) -> None:
-        settings_collection = database.Database().get_collection("settings")
-        settings_query = {"guild_id": interaction.guild_id}
-        settings_result = settings_collection.find_one(settings_query)
+        settings_result = await helpers.get_settings(interaction.guild_id)
 
         instructor_role = interaction.guild.get_role(settings_result["role_id"])
         permission = {
@@ -501,10 +649,39 @@ class CreateTeamConfirmButtons(discord.ui.View):
             "voice_channel_id": voice_channel.id,
             "name": self.name,
             "members": [] if instructor else [interaction.user.id],
-            "peer_review": [],
         }
         team_collection = database.Database().get_collection("teams")
-        team_collection.insert_one(team_document)
+        try:
+            await team_collection.insert_one(team_document)
+        except DuplicateKeyError:
+            # Since the checks ran, either another team with the same name was created
+            # or the user joined a team. The unique indexes turn down both.
+            await channel.delete()
+            await voice_channel.delete()
+            await category.delete()
+            joined = not instructor and await membership.is_member(
+                guild_id=interaction.guild_id, user_id=interaction.user.id
+            )
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=(
+                    "You are already in a team."
+                    if joined
+                    else "A team with this name already exists."
+                ),
+                timestamp=True,
+            )
+            return await interaction.response.edit_message(embed=embed, view=None)
+
+        if not instructor:
+            membership.index.add(
+                guild_id=interaction.guild_id,
+                user_id=interaction.user.id,
+                team=self.name,
+            )
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -533,12 +710,11 @@ class CreateTeamConfirmButtons(discord.ui.View):
         await interaction.response.edit_message(embed=embed, view=None)
 
 
-class JoinTeamDropdown(discord.ui.Select):
+class JoinTeamDropdown(pagination.PaginatedSelect):
     def __init__(
-        self, options: list[discord.SelectOption], current_team: str = None
+        self, source: pagination.QuerySource, current_team: str = None
     ) -> None:
-        super().__init__()
-        self.options = options
+        super().__init__(source=source)
         self.current_team = current_team
 
     async def callback(self, interaction: discord.Interaction) -> None:
@@ -577,16 +753,32 @@ class JoinTeamConfirmButtons(discord.ui.View):
     async def confirm(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ) -> None:
-        collection = database.Database().get_collection("teams")
-
-        current_team_query = {
-            "guild_id": interaction.guild_id,
-            "name": self.current_team,
-        }
-        current_team_result = collection.find_one(current_team_query)
+        settings_result = await helpers.get_settings(interaction.guild_id)
+        try:
+            new_team_result, current_team_result = await membership.join(
+                guild_id=interaction.guild_id,
+                user_id=interaction.user.id,
+                team=self.new_team,
+                team_size=settings_result["team_size"],
+            )
+        except membership.MembershipError as error:
+            if error.left:
+                channel = interaction.guild.get_channel(error.left["channel_id"])
+                await channel.category.set_permissions(
+                    target=interaction.user, overwrite=None
+                )
 
-        new_team_query = {"guild_id": interaction.guild_id, "name": self.new_team}
-        new_team_result = collection.find_one(new_team_query)
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            view = discord.ui.View()
+            view.add_item(JoinTeamBackButton())
+            return await interaction.response.edit_message(embed=embed, view=view)
 
         if current_team_result:
             channel = interaction.guild.get_channel(current_team_result["channel_id"])
@@ -594,21 +786,11 @@ class JoinTeamConfirmButtons(discord.ui.View):
                 target=interaction.user, overwrite=None
             )
 
-            current_team_query = {
-                "guild_id": interaction.guild_id,
-                "name": current_team_result["name"],
-            }
-            current_team_value = {"$pull": {"members": interaction.user.id}}
-            collection.update_one(current_team_query, current_team_value)
-
         channel = interaction.guild.get_channel(new_team_result["channel_id"])
         await channel.category.set_permissions(
             target=interaction.user, read_messages=True
         )
 
-        new_team_value = {"$push": {"members": interaction.user.id}}
-        collection.update_one(new_team_query, new_team_value)
-
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
@@ -655,10 +837,8 @@ class JoinTeamBackButton(discord.ui.Button):
 
 
 class LeaveTeamConfirmButtons(discord.ui.View):
-    def __init__(self, name: str, channel_id: int) -> None:
+    def __init__(self) -> None:
         super().__init__()
-        self.name = name
-        self.channel_id = channel_id
 
     @discord.ui.button(
         label="Confirm", style=discord.ButtonStyle.green, custom_id="leave_team_confirm"
@@ -666,12 +846,21 @@ class LeaveTeamConfirmButtons(discord.ui.View):
     async def confirm(
         self, interaction: discord.Interaction, button: discord.ui.Button
     ) -> None:
-        collection = database.Database().get_collection("teams")
-        query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        value = {"$pull": {"members": interaction.user.id}}
-        collection.update_one(query, value)
+        result = await membership.leave(
+            guild_id=interaction.guild_id, user_id=interaction.user.id
+        )
+        if result is None:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="Cannot leave team because you are not in any teams yet.",
+                timestamp=True,
+            )
+            return await interaction.response.edit_message(embed=embed, view=None)
 
-        channel = interaction.guild.get_channel(self.channel_id)
+        channel = interaction.guild.get_channel(result["channel_id"])
         await channel.category.set_permissions(target=interaction.user, overwrite=None)
 
         embed = embeds.make_embed(
@@ -679,7 +868,7 @@ class LeaveTeamConfirmButtons(discord.ui.View):
             color=discord.Color.green(),
             thumbnail_url="https://i.imgur.com/W7VJssL.png",
             title="Success",
-            description=f"You were successfully removed from the team '{self.name}'.",
+            description=f"You were successfully removed from the team '{result['name']}'.",
             timestamp=True,
         )
         await interaction.response.edit_message(embed=embed, view=None)
@@ -751,14 +940,46 @@ class RenameTeamModal(discord.ui.Modal, title="Rename Team"):
         new_name = self.new_name.value
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-        team_result = team_collection.find_one(team_query)
+        team_result = await team_collection.find_one(team_query)
+
+        embed = await helpers.cooldown_check(
+            interaction=interaction, command="team rename"
+        )
+        if isinstance(embed, discord.Embed):
+            return await interaction.response.edit_message(embed=embed, view=None)
 
         new_value = {"$set": {"name": new_name}}
-        team_collection.update_one(team_query, new_value)
+        try:
+            await team_collection.update_one(team_query, new_value)
+        except Exception as error:
+            # The team was not renamed, so the use does not count toward the cooldown.
+            cooldown.manager.refund(
+                guild_id=interaction.guild_id,
+                user_id=interaction.user.id,
+                command="team rename",
+            )
+            if not isinstance(error, DuplicateKeyError):
+                raise
 
-        team_query = {"guild_id": interaction.guild_id, "peer_review": self.name}
-        new_value = {"$set": {"peer_review.$": new_name}}
-        team_collection.update_many(team_query, new_value)
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="A team with this name already exists.",
+                timestamp=True,
+            )
+            return await interaction.response.edit_message(embed=embed, view=None)
+        membership.index.rename(
+            guild_id=interaction.guild_id, name=team_result["name"], new_name=new_name
+        )
+
+        await distribution.rename_team(
+            guild_id=interaction.guild_id, name=self.name, new_name=new_name
+        )
+        await grades.rename_team(
+            guild_id=interaction.guild_id, name=self.name, new_name=new_name
+        )
 
         channel = interaction.guild.get_channel(team_result["channel_id"])
         await channel.edit(name=new_name)
@@ -769,8 +990,6 @@ class RenameTeamModal(discord.ui.Modal, title="Rename Team"):
         category = channel.category
         await category.edit(name=new_name)
 
-        await helpers.set_cooldown(interaction=interaction, command="team rename")
-
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
@@ -792,13 +1011,12 @@ class RenameTeamModal(discord.ui.Modal, title="Rename Team"):
             description="Oops! Something went wrong. Please try again later!",
             timestamp=True,
         )
-        await interaction.response.edit_message(embed=embed, ephemeral=True)
+        await interaction.response.edit_message(embed=embed, view=None)
 
 
-class EditTeamDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]):
-        super().__init__()
-        self.options = options
+class EditTeamDropdown(pagination.PaginatedSelect):
+    def __init__(self, source: pagination.QuerySource):
+        super().__init__(source=source)
 
     async def callback(self, interaction: discord.Interaction) -> None:
         edit_team_modal = EditTeamModal(self.values[0])
@@ -824,14 +1042,34 @@ class EditTeamModal(discord.ui.Modal, title=None):
         new_name = self.new_name.value
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id, "name": self.name}
-        team_result = team_collection.find_one(team_query)
+        team_result = await team_collection.find_one(team_query)
 
         new_value = {"$set": {"name": new_name}}
-        team_collection.update_one(team_query, new_value)
+        try:
+            await team_collection.update_one(team_query, new_value)
+        except DuplicateKeyError:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description="A team with this name already exists.",
+                timestamp=True,
+            )
 
-        team_query = {"guild_id": interaction.guild_id, "peer_review": self.name}
-        new_value = {"$set": {"peer_review.$": new_name}}
-        team_collection.update_many(team_query, new_value)
+            view = discord.ui.View()
+            view.add_item(EditTeamBackButton())
+            return await interaction.response.edit_message(embed=embed, view=view)
+        membership.index.rename(
+            guild_id=interaction.guild_id, name=team_result["name"], new_name=new_name
+        )
+
+        await distribution.rename_team(
+            guild_id=interaction.guild_id, name=self.name, new_name=new_name
+        )
+        await grades.rename_team(
+            guild_id=interaction.guild_id, name=self.name, new_name=new_name
+        )
 
         channel = interaction.guild.get_channel(team_result["channel_id"])
         await channel.edit(name=new_name)
@@ -842,8 +1080,6 @@ class EditTeamModal(discord.ui.Modal, title=None):
         category = channel.category
         await category.edit(name=new_name)
 
-        await helpers.set_cooldown(interaction=interaction, command="team rename")
-
         embed = embeds.make_embed(
             interaction=interaction,
             color=discord.Color.green(),
@@ -886,10 +1122,9 @@ class EditTeamBackButton(discord.ui.Button):
         await interaction.response.edit_message(embed=embed, view=view)
 
 
-class RemoveTeamDropdown(discord.ui.Select):
-    def __init__(self, options: list[discord.SelectOption]):
-        super().__init__()
-        self.options = options
+class RemoveTeamDropdown(pagination.PaginatedSelect):
+    def __init__(self, source: pagination.QuerySource):
+        super().__init__(source=source)
 
     async def callback(self, interaction: discord.Interaction) -> None:
         embed = embeds.make_embed(
@@ -919,18 +1154,18 @@ class RemoveTeamConfirmButtons(discord.ui.View):
     ) -> None:
         collection = database.Database().get_collection("teams")
         query = {"guild_id": interaction.guild_id, "name": self.name}
-        result = collection.find_one(query)
+        result = await collection.find_one(query)
 
         channel = interaction.guild.get_channel(result["channel_id"])
         for channel in channel.category.channels:
             await channel.delete()
 
         await channel.category.delete()
-        collection.delete_one(query)
+        await collection.delete_one(query)
+        membership.index.drop(guild_id=interaction.guild_id, team=self.name)
 
-        query = {"guild_id": interaction.guild_id}
-        new_value = {"$pull": {"peer_review": self.name}}
-        collection.update_many(query, new_value)
+        await distribution.remove_team(guild_id=interaction.guild_id, name=self.name)
+        await grades.remove_team(guild_id=interaction.guild_id, name=self.name)
 
         embed = embeds.make_embed(
             interaction=interaction,
@@ -977,6 +1212,90 @@ class RemoveTeamBackButton(discord.ui.Button):
         await interaction.response.edit_message(embed=embed, view=view)
 
 
+class ImportTeamsConfirmButtons(discord.ui.View):
+    def __init__(self, teams: list[roster.PlannedTeam]) -> None:
+        super().__init__()
+        self.teams = teams
+
+    @discord.ui.button(
+        label="Confirm",
+        style=discord.ButtonStyle.green,
+        custom_id="import_teams_confirm",
+    )
+    async def confirm(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await interaction.response.defer()
+        await interaction.edit_original_response(
+            embed=embeds.make_embed(
+                color=discord.Color.blurple(), description="*Creating teams...*"
+            ),
+            view=None,
+        )
+
+        # Teams may have been created or joined since the preview was shown.
+        existing, assigned = await roster.get_taken(interaction.guild_id)
+        teams, dropped = roster.exclude(
+            self.teams, existing=existing, assigned=assigned
+        )
+
+        settings_result = await helpers.get_settings(interaction.guild_id)
+        try:
+            if not teams:
+                raise roster.RosterError(
+                    "Every team or student in this roster was taken in the meantime."
+                )
+            roster.validate(interaction.guild, teams)
+            created = await roster.create(
+                guild=interaction.guild,
+                teams=teams,
+                instructor_role=interaction.guild.get_role(settings_result["role_id"]),
+                bot_user=interaction.client.user,
+            )
+        except roster.RosterError as error:
+            embed = embeds.make_embed(
+                interaction=interaction,
+                color=discord.Color.red(),
+                thumbnail_url="https://i.imgur.com/boVVFnQ.png",
+                title="Error",
+                description=str(error),
+                timestamp=True,
+            )
+            return await interaction.edit_original_response(embed=embed)
+
+        description = f"Successfully created {created} teams."
+        if created < len(self.teams):
+            description += f" {len(self.teams) - created} teams were skipped because their name or one of their members was taken."
+        if dropped:
+            description += f" {dropped} students were left out because they joined another team in the meantime."
+
+        embed = embeds.make_embed(
+            interaction=interaction,
+            color=discord.Color.green(),
+            thumbnail_url="https://i.imgur.com/W7VJssL.png",
+            title="Success",
+            description=description,
+            timestamp=True,
+        )
+        await interaction.edit_original_response(embed=embed)
+
+    @discord.ui.button(
+        label="Cancel", style=discord.ButtonStyle.red, custom_id="import_teams_cancel"
+    )
+    async def cancel(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        embed = embeds.make_embed(
+            interaction=interaction,
+            color=discord.Color.blurple(),
+            thumbnail_url="https://i.imgur.com/QQiSpLF.png",
+            title="Action cancelled",
+            description="Your team import request was canceled.",
+            timestamp=True,
+        )
+        await interaction.response.edit_message(embed=embed, view=None)
+
+
 class LockTeamConfirmButtons(discord.ui.View):
     def __init__(self) -> None:
         super().__init__()
@@ -990,11 +1309,12 @@ class LockTeamConfirmButtons(discord.ui.View):
         settings_collection = database.Database().get_collection("settings")
         settings_query = {"guild_id": interaction.guild_id}
         new_value = {"$set": {"teams_locked": True}}
-        settings_collection.update_one(settings_query, new_value)
+        await settings_collection.update_one(settings_query, new_value)
+        helpers.invalidate_settings(interaction.guild_id)
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id}
-        team_results = team_collection.find(team_query)
+        team_results = await team_collection.find(team_query).to_list()
         team_list = [
             f"{index + 1}. {value['name']}" for index, value in enumerate(team_results)
         ]
@@ -1041,11 +1361,12 @@ class UnlockTeamConfirmButtons(discord.ui.View):
         settings_collection = database.Database().get_collection("settings")
         settings_query = {"guild_id": interaction.guild_id}
         new_value = {"$set": {"teams_locked": False}}
-        settings_collection.update_one(settings_query, new_value)
+        await settings_collection.update_one(settings_query, new_value)
+        helpers.invalidate_settings(interaction.guild_id)
 
         team_collection = database.Database().get_collection("teams")
         team_query = {"guild_id": interaction.guild_id}
-        team_results = team_collection.find(team_query)
+        team_results = await team_collection.find(team_query).to_list()
         team_list = [
             f"{index + 1}. {value['name']}" for index, value in enumerate(team_results)
         ]
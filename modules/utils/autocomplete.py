@@ -0,0 +1,90 @@
+import bisect
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from modules.utils import cache, database
+
+log = logging.getLogger(__name__)
+
+# Discord shows at most 25 autocomplete choices.
+MAX_CHOICES = 25
+
+
+@dataclass
+class Assignment:
+    name: str
+    due_date: float
+    peer_review: bool
+
+
+class AssignmentIndex(cache.GuildIndex[tuple[list[str], list[Assignment]]]):
+    """Per-guild list of assignments sorted by lowercase name, for autocomplete.
+
+    A guild is loaded from the assignments collection the first time it is searched. The
+    views that create, edit or remove assignments call invalidate(), so a search usually
+    never queries the database and only needs a binary search for prefix matches.
+    """
+
+    async def _load(self, guild_id: int) -> tuple[list[str], list[Assignment]]:
+        collection = database.Database().get_collection("assignments")
+        query = {"guild_id": guild_id}
+        projection = {"name": 1, "due_date": 1, "peer_review": 1}
+        results = await collection.find(query, projection).to_list()
+        assignments = sorted(
+            (
+                Assignment(
+                    name=result["name"],
+                    due_date=result["due_date"],
+                    peer_review=result["peer_review"],
+                )
+                for result in results
+            ),
+            key=lambda assignment: assignment.name.lower(),
+        )
+        keys = [assignment.name.lower() for assignment in assignments]
+        return keys, assignments
+
+    async def search(
+        self,
+        guild_id: int,
+        current: str,
+        predicate: Callable[[Assignment], bool] = None,
+    ) -> list[str]:
+        """Names of up to 25 assignments matching what was typed, case-insensitively.
+
+        Names starting with `current` come first, then names containing it elsewhere.
+        `predicate`, if given, filters the assignments.
+        """
+        keys, assignments = await self._get(guild_id)
+        current = current.lower()
+        predicate = predicate or (lambda assignment: True)
+
+        # Names starting with `current` sort right after it, up to the first that does not.
+        start = bisect.bisect_left(keys, current)
+        prefixed = (
+            assignment.name
+            for _, assignment in itertools.takewhile(
+                lambda item: item[0].startswith(current),
+                zip(keys[start:], assignments[start:]),
+            )
+            if predicate(assignment)
+        )
+        # Empty input matches everything as a prefix already.
+        contained = (
+            assignment.name
+            for key, assignment in zip(keys, assignments)
+            if current
+            and current in key
+            and not key.startswith(current)
+            and predicate(assignment)
+        )
+        return list(itertools.islice(itertools.chain(prefixed, contained), MAX_CHOICES))
+
+    def invalidate(self, guild_id: int) -> None:
+        self._touch(guild_id)
+        self.guilds.pop(guild_id, None)
+
+
+assignments = AssignmentIndex()
@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pathlib
+import tempfile
+import zipfile
+
+from modules.utils import executor, metadata, storage
+
+log = logging.getLogger(__name__)
+
+_pending: dict[tuple[int, str, tuple[str, ...]], asyncio.Task] = {}
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()[:32]
+
+
+def _build(
+    guild_id: int,
+    assignment: str,
+    teams: list[str],
+    files: list[tuple[str, pathlib.Path, str]],
+) -> pathlib.Path:
+    """Blocking part of get_bundle(), run it in a thread."""
+    # Bundles are named by their inputs followed by their content, so a bundle is reused
+    # as long as nothing changed and superseded bundles can be found and removed.
+    prefix = _digest(str(guild_id), assignment, *teams)
+    content = _digest(*(f"{arcname}:{digest}" for arcname, _, digest in files))
+    guild_dir = storage.ROOT.joinpath(str(guild_id))
+    bundle_dir = guild_dir.joinpath(".bundles")
+    bundle = bundle_dir.joinpath(f"{prefix}-{content}.zip")
+    if bundle.is_file():
+        return bundle
+
+    bundle_dir.mkdir(parents=True, exist_ok=True)
+    for stale in bundle_dir.glob(f"{prefix}-*.zip"):
+        stale.unlink(missing_ok=True)
+
+    # ZipFile.write() copies each file in chunks, so the archive never sits in memory.
+    with tempfile.NamedTemporaryFile(
+        dir=bundle_dir, suffix=".tmp", delete=False
+    ) as temp:
+        try:
+            with zipfile.ZipFile(
+                temp, mode="w", compression=zipfile.ZIP_DEFLATED
+            ) as archive:
+                for arcname, path, _ in files:
+                    archive.write(path, arcname=arcname)
+        except BaseException:
+            os.unlink(temp.name)
+            raise
+
+    os.replace(temp.name, bundle)
+    log.info(
+        f"Built bundle '{bundle.name}' with {len(files)} files for guild {guild_id}."
+    )
+    return bundle
+
+
+def _usage(guild_id: int) -> int:
+    bundle_dir = storage.ROOT.joinpath(str(guild_id), ".bundles")
+    if not bundle_dir.is_dir():
+        return 0
+
+    total = 0
+    for path in bundle_dir.iterdir():
+        # Superseded bundles are removed while others are being built.
+        try:
+            total += path.stat().st_size
+        except FileNotFoundError:
+            pass
+    return total
+
+
+async def usage(guild_id: int) -> int:
+    """Bytes taken by the cached bundles of a guild, including ones being built."""
+    return await executor.filesystem.run(_usage, guild_id)
+
+
+async def get_bundle(
+    guild_id: int, assignment: str, teams: list[str]
+) -> pathlib.Path | None:
+    """Zip archive of every submission of `teams` for an assignment, None if there are none.
+
+    Archives are cached on disk per guild, assignment, set of teams and content, and
+    concurrent requests for the same archive share one build.
+    """
+    teams = sorted(teams)
+    directories = {
+        team: storage.ROOT.joinpath(str(guild_id), "submissions", team, assignment)
+        for team in teams
+    }
+    teams_by_directory = {
+        metadata.relative(directory): team for team, directory in directories.items()
+    }
+    documents = await metadata.get_files(guild_id, *directories.values())
+    if not documents:
+        return None
+
+    files = [
+        (
+            f"{teams_by_directory[document['directory']]}/{document['name']}",
+            metadata.local_path(document),
+            document["hash"],
+        )
+        for document in documents
+    ]
+
+    key = (guild_id, assignment, tuple(teams))
+    task = _pending.get(key)
+    if task is None:
+        task = _pending[key] = asyncio.create_task(
+            executor.filesystem.run(_build, guild_id, assignment, teams, files)
+        )
+        task.add_done_callback(lambda _: _pending.pop(key, None))
+
+    return await asyncio.shield(task)
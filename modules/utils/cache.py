@@ -0,0 +1,92 @@
+import time
+from collections import defaultdict
+from typing import Any, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small in-process cache whose entries expire `ttl` seconds after being set.
+
+    `None` is a valid cached value, so use `in` to tell a cached miss from an absent key.
+    """
+
+    def __init__(self, ttl: float) -> None:
+        self.ttl = ttl
+        self._entries: dict[Hashable, tuple[float, Any]] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._lookup(key) is not _MISSING
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+
+        expires_on, value = entry
+        if expires_on <= time.monotonic():
+            self._entries.pop(key, None)
+            return _MISSING
+
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def items(self) -> list[tuple[Hashable, Any]]:
+        """Entries that have not expired yet."""
+        now = time.monotonic()
+        return [
+            (key, value)
+            for key, (expires_on, value) in self._entries.items()
+            if expires_on > now
+        ]
+
+    def prune(self) -> None:
+        """Drop expired entries that were never looked up again."""
+        now = time.monotonic()
+        for key, (expires_on, _) in list(self._entries.items()):
+            if expires_on <= now:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class GuildIndex(Generic[T]):
+    """Per-guild in-memory entry, loaded the first time a guild is looked up.
+
+    Subclasses implement `_load()` and call `_touch()` on every change they make or
+    that makes an entry stale. A load that ran while a guild was touched may be stale, so
+    it is retried instead of being kept.
+    """
+
+    def __init__(self) -> None:
+        self.guilds: dict[int, T] = {}
+        self._versions: defaultdict[int, int] = defaultdict(int)
+
+    async def _load(self, guild_id: int) -> T:
+        raise NotImplementedError
+
+    async def _get(self, guild_id: int) -> T:
+        entry = self.guilds.get(guild_id)
+        while entry is None:
+            version = self._versions[guild_id]
+            loaded = await self._load(guild_id)
+            if version != self._versions[guild_id]:
+                continue
+            entry = self.guilds.setdefault(guild_id, loaded)
+
+        return entry
+
+    def _touch(self, guild_id: int) -> None:
+        self._versions[guild_id] += 1
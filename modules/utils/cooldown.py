@@ -0,0 +1,200 @@
+import datetime
+import logging
+import time
+
+from pymongo import DeleteOne, UpdateOne
+from pymongo.errors import PyMongoError
+
+from modules.utils import database
+
+log = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Allows `rate` uses per `per` seconds, refilling continuously rather than in windows."""
+
+    __slots__ = ("rate", "per", "tokens", "updated_on")
+
+    def __init__(
+        self, rate: int, per: float, tokens: float = None, updated_on: float = None
+    ) -> None:
+        self.rate = rate
+        self.per = per
+        self.tokens = float(rate) if tokens is None else tokens
+        self.updated_on = time.time() if updated_on is None else updated_on
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(now - self.updated_on, 0.0)
+        self.tokens = min(
+            float(self.rate), self.tokens + elapsed * self.rate / self.per
+        )
+        self.updated_on = now
+
+    def retry_after(self, now: float) -> float:
+        """Seconds until the next use is allowed, 0 if it is allowed right now."""
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) * self.per / self.rate
+
+    def consume(self, now: float) -> float:
+        """Take one token if available. Returns the retry delay like retry_after()."""
+        retry_after = self.retry_after(now)
+        if not retry_after:
+            self.tokens -= 1
+        return retry_after
+
+    def refund(self, now: float) -> None:
+        """Give back a token taken by consume() for a use that did not go through."""
+        self._refill(now)
+        self.tokens = min(float(self.rate), self.tokens + 1)
+
+    def full_on(self) -> float:
+        """Timestamp at which the bucket is full again and no longer worth keeping."""
+        return self.updated_on + (self.rate - self.tokens) * self.per / self.rate
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.rate
+
+
+class CooldownManager:
+    """In-process rate limiter keyed by (guild, user, command).
+
+    Limits come from the `cooldown` collection and are loaded once; buckets live in memory
+    and are written behind to the `tasks` collection by `flush()` so that they survive a
+    restart. Consuming never touches the database.
+    """
+
+    def __init__(self) -> None:
+        self.limits: dict[tuple[int, str], tuple[int, float]] = {}
+        self.buckets: dict[tuple[int, int, str], TokenBucket] = {}
+        self.dirty: set[tuple[int, int, str]] = set()
+
+    async def load(self) -> None:
+        """Load every configured limit and every bucket that is still cooling down."""
+        cooldown_collection = database.Database().get_collection("cooldown")
+        self.limits = {
+            (result["guild_id"], result["command"]): (result["rate"], result["per"])
+            async for result in cooldown_collection.find({})
+        }
+
+        task_collection = database.Database().get_collection("tasks")
+        # Documents from the polling model have no bucket state and would never expire.
+        await task_collection.delete_many({"tokens": {"$exists": False}})
+
+        now = time.time()
+        self.buckets = {}
+        async for result in task_collection.find({"ready_on": {"$gt": now}}):
+            limit = self.limits.get((result["guild_id"], result["command"]))
+            if limit is None:
+                continue
+
+            key = (result["guild_id"], result["user_id"], result["command"])
+            self.buckets[key] = TokenBucket(
+                rate=limit[0],
+                per=limit[1],
+                tokens=min(result["tokens"], limit[0]),
+                updated_on=result["updated_on"],
+            )
+
+        log.info(
+            f"Loaded {len(self.limits)} cooldown limits and {len(self.buckets)} active cooldowns."
+        )
+
+    def set_limit(self, guild_id: int, command: str, rate: int, per: float) -> None:
+        """Apply a limit that was just written to the cooldown collection."""
+        self.limits[(guild_id, command)] = (rate, per)
+        for key, bucket in self.buckets.items():
+            if key[0] == guild_id and key[2] == command:
+                bucket.rate = rate
+                bucket.per = per
+                bucket.tokens = min(bucket.tokens, float(rate))
+                self.dirty.add(key)
+
+    def _bucket(self, guild_id: int, user_id: int, command: str) -> TokenBucket | None:
+        limit = self.limits.get((guild_id, command))
+        if limit is None:
+            return None
+
+        key = (guild_id, user_id, command)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(rate=limit[0], per=limit[1])
+        return bucket
+
+    def consume(self, guild_id: int, user_id: int, command: str) -> float:
+        """Use the command once if allowed. Returns 0 on success, the retry delay otherwise."""
+        bucket = self._bucket(guild_id, user_id, command)
+        if bucket is None:
+            return 0.0
+
+        retry_after = bucket.consume(time.time())
+        if not retry_after:
+            self.dirty.add((guild_id, user_id, command))
+        return retry_after
+
+    def retry_after(self, guild_id: int, user_id: int, command: str) -> float:
+        """Like consume(), but only checks the cooldown without using the command."""
+        key = (guild_id, user_id, command)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return 0.0
+        return bucket.retry_after(time.time())
+
+    def refund(self, guild_id: int, user_id: int, command: str) -> None:
+        """Give back a use taken by consume() when the command did not go through."""
+        key = (guild_id, user_id, command)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            return
+
+        bucket.refund(time.time())
+        self.dirty.add(key)
+
+    async def flush(self) -> None:
+        """Persist the buckets changed since the last flush in a single bulk write."""
+        now = time.time()
+        for key, bucket in list(self.buckets.items()):
+            if key not in self.dirty and bucket.is_full(now):
+                del self.buckets[key]
+
+        if not self.dirty:
+            return
+
+        requests = []
+        for key in self.dirty:
+            guild_id, user_id, command = key
+            query = {"guild_id": guild_id, "user_id": user_id, "command": command}
+            bucket = self.buckets.get(key)
+
+            # Full buckets behave exactly like missing ones, so stop tracking them.
+            if bucket is None or bucket.is_full(now):
+                self.buckets.pop(key, None)
+                requests.append(DeleteOne(query))
+                continue
+
+            ready_on = bucket.full_on()
+            new_value = {
+                "$set": {
+                    "tokens": bucket.tokens,
+                    "updated_on": bucket.updated_on,
+                    "ready_on": ready_on,
+                    "expires_on": datetime.datetime.fromtimestamp(
+                        ready_on, tz=datetime.timezone.utc
+                    ),
+                }
+            }
+            requests.append(UpdateOne(query, new_value, upsert=True))
+
+        dirty = self.dirty
+        self.dirty = set()
+        try:
+            collection = database.Database().get_collection("tasks")
+            await collection.bulk_write(requests, ordered=False)
+        except PyMongoError as error:
+            self.dirty |= dirty
+            log.error(f"Unable to persist cooldowns: {error}")
+
+
+manager = CooldownManager()
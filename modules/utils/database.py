@@ -1,39 +1,208 @@
+import itertools
 import logging
+import threading
 import urllib.parse
-from typing import Any, Mapping
+from typing import Any, AsyncIterator, Callable, Mapping
 
+import confuse
 from pymongo import MongoClient
 from pymongo.collection import Collection
+from pymongo.cursor import Cursor
 
+from modules.utils import executor
 from modules.utils.config import config
 
 log = logging.getLogger(__name__)
 
 
 class Database:
+    """Accessor for the process-wide MongoClient.
+
+    The client owns the connection pool and its monitor threads, so it is created lazily
+    on first use and shared by every instance. Call `Database.close()` on shutdown.
+    """
+
+    _client: MongoClient | None = None
+    _database_name: str | None = None
+    _lock = threading.Lock()
+
     def __init__(self) -> None:
+        self.client = self.get_client()
+        self.database_name = self._database_name
+
+    @classmethod
+    def get_client(cls) -> MongoClient:
+        if cls._client is None:
+            with cls._lock:
+                if cls._client is None:
+                    cls._client = cls._create_client()
+        return cls._client
+
+    @classmethod
+    def _create_client(cls) -> MongoClient:
         # Username and password must be escaped according to RFC 3986, use urllib.parse.quote_plus.
-        self.username = urllib.parse.quote_plus(
+        username = urllib.parse.quote_plus(
             config["database"]["username"].as_str_expanded()
         )
-        self.password = urllib.parse.quote_plus(
+        password = urllib.parse.quote_plus(
             config["database"]["password"].as_str_expanded()
         )
-        self.hostname = config["database"]["hostname"].as_str_expanded()
-        self.port = config["database"]["port"].as_str_expanded()
-        self.database_name = config["database"]["database_name"].as_str_expanded()
+        hostname = config["database"]["hostname"].as_str_expanded()
+        port = config["database"]["port"].as_str_expanded()
+        database_name = config["database"]["database_name"].as_str_expanded()
 
-        if not all(
-            [self.hostname, self.port, self.username, self.password, self.database_name]
-        ):
+        if not all([hostname, port, username, password, database_name]):
             log.error("One or more database connection variables are missing.")
             raise SystemExit
 
-        self.url = f"mongodb://{self.username}:{self.password}@{self.hostname}:{self.port}/?authSource={self.database_name}"
-        self.client = MongoClient(self.url)
+        # Pool and timeout options are optional in config.yml so that older configs keep working.
+        options = config["database"]
+        url = f"mongodb://{username}:{password}@{hostname}:{port}/?authSource={database_name}"
+        client = MongoClient(
+            url,
+            maxPoolSize=options["max_pool_size"].get(confuse.Integer(default=100)),
+            minPoolSize=options["min_pool_size"].get(confuse.Integer(default=0)),
+            maxIdleTimeMS=options["max_idle_time_ms"].get(
+                confuse.Integer(default=60000)
+            ),
+            connectTimeoutMS=options["connect_timeout_ms"].get(
+                confuse.Integer(default=5000)
+            ),
+            serverSelectionTimeoutMS=options["server_selection_timeout_ms"].get(
+                confuse.Integer(default=5000)
+            ),
+            socketTimeoutMS=options["socket_timeout_ms"].get(
+                confuse.Integer(default=10000)
+            ),
+        )
 
-    def get_collection(self, collection: str) -> Collection[Mapping[str, Any] | Any]:
+        cls._database_name = database_name
+        log.info(f"Created MongoDB client for {hostname}:{port}.")
+        return client
+
+    @classmethod
+    def close(cls) -> None:
+        with cls._lock:
+            if cls._client is None:
+                return
+
+            cls._client.close()
+            cls._client = None
+            log.info("Closed MongoDB client.")
+
+    def get_collection(self, collection: str) -> "AsyncCollection":
         client = self.client
         database = client[self.database_name]
         collection = database[collection]
-        return collection
+        return AsyncCollection(collection)
+
+
+class AsyncCursor:
+    """Lazily built cursor whose iteration runs in a worker thread.
+
+    Modifiers such as `sort()` and `limit()` are recorded and applied when the cursor is
+    consumed with `to_list()` or `async for`, mirroring the Motor cursor interface.
+    """
+
+    def __init__(self, factory: Callable[[], Cursor]) -> None:
+        self._factory = factory
+        self._modifiers = []
+
+    def _chain(self, name: str, *args, **kwargs) -> "AsyncCursor":
+        self._modifiers.append((name, args, kwargs))
+        return self
+
+    def sort(self, *args, **kwargs) -> "AsyncCursor":
+        return self._chain("sort", *args, **kwargs)
+
+    def skip(self, *args, **kwargs) -> "AsyncCursor":
+        return self._chain("skip", *args, **kwargs)
+
+    def limit(self, *args, **kwargs) -> "AsyncCursor":
+        return self._chain("limit", *args, **kwargs)
+
+    async def to_list(self, length: int | None = None) -> list[Mapping[str, Any]]:
+        def task() -> list[Mapping[str, Any]]:
+            cursor = self._factory()
+            for name, args, kwargs in self._modifiers:
+                cursor = getattr(cursor, name)(*args, **kwargs)
+            with cursor:
+                return list(itertools.islice(cursor, length))
+
+        return await executor.database.run(task)
+
+    def __aiter__(self) -> AsyncIterator[Mapping[str, Any]]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[Mapping[str, Any]]:
+        for document in await self.to_list():
+            yield document
+
+
+class AsyncCollection:
+    """Awaitable wrapper around a pymongo Collection.
+
+    Every call is executed in a worker thread so that a slow query never blocks the
+    event loop (and with it the gateway heartbeat). The wrapped collection is
+    available as `collection` for anything that is not proxied here.
+    """
+
+    def __init__(self, collection: Collection[Mapping[str, Any] | Any]) -> None:
+        self.collection = collection
+
+    @property
+    def name(self) -> str:
+        return self.collection.name
+
+    async def _run(self, method: str, *args, **kwargs) -> Any:
+        return await executor.database.run(
+            getattr(self.collection, method), *args, **kwargs
+        )
+
+    def find(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(lambda: self.collection.find(*args, **kwargs))
+
+    def aggregate(self, *args, **kwargs) -> AsyncCursor:
+        return AsyncCursor(lambda: self.collection.aggregate(*args, **kwargs))
+
+    async def find_one(self, *args, **kwargs) -> Mapping[str, Any] | None:
+        return await self._run("find_one", *args, **kwargs)
+
+    async def find_one_and_update(self, *args, **kwargs) -> Mapping[str, Any] | None:
+        return await self._run("find_one_and_update", *args, **kwargs)
+
+    async def distinct(self, *args, **kwargs) -> list[Any]:
+        return await self._run("distinct", *args, **kwargs)
+
+    async def count_documents(self, *args, **kwargs) -> int:
+        return await self._run("count_documents", *args, **kwargs)
+
+    async def insert_one(self, *args, **kwargs) -> Any:
+        return await self._run("insert_one", *args, **kwargs)
+
+    async def insert_many(self, *args, **kwargs) -> Any:
+        return await self._run("insert_many", *args, **kwargs)
+
+    async def update_one(self, *args, **kwargs) -> Any:
+        return await self._run("update_one", *args, **kwargs)
+
+    async def update_many(self, *args, **kwargs) -> Any:
+        return await self._run("update_many", *args, **kwargs)
+
+    async def delete_one(self, *args, **kwargs) -> Any:
+        return await self._run("delete_one", *args, **kwargs)
+
+    async def delete_many(self, *args, **kwargs) -> Any:
+        return await self._run("delete_many", *args, **kwargs)
+
+    async def bulk_write(self, *args, **kwargs) -> Any:
+        return await self._run("bulk_write", *args, **kwargs)
+
+    async def index_information(self) -> dict[str, Any]:
+        return await self._run("index_information")
+
+    async def create_indexes(self, *args, **kwargs) -> list[str]:
+        return await self._run("create_indexes", *args, **kwargs)
+
+    async def drop_index(self, *args, **kwargs) -> None:
+        return await self._run("drop_index", *args, **kwargs)
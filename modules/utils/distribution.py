@@ -0,0 +1,293 @@
+import random
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable, Iterator
+
+from pymongo.errors import DuplicateKeyError
+
+from modules.utils import database
+
+# How many random candidates avoid_previous() tries, and how many swaps it tries per
+# repeated pairing when repairing the best one.
+ATTEMPTS = 8
+SWAPS = 16
+
+
+@dataclass
+class Block:
+    """Teams in `order` review the teams `offsets` positions after them, wrapping around."""
+
+    order: list[str]
+    offsets: list[int]
+
+    def reviewees(self, index: int) -> list[str]:
+        return [
+            self.order[(index + offset) % len(self.order)] for offset in self.offsets
+        ]
+
+
+@dataclass
+class Distribution:
+    """Compact peer review assignment: a few blocks of (order, offsets) instead of a list
+    of reviewees per team. `seed` reproduces the same distribution for the same teams.
+    """
+
+    blocks: list[Block]
+    seed: int
+    _positions: dict[str, tuple[Block, int]] = field(default=None, repr=False)
+
+    def reviewees(self, team: str) -> list[str]:
+        if self._positions is None:
+            self._positions = {
+                name: (block, index)
+                for block in self.blocks
+                for index, name in enumerate(block.order)
+            }
+        block, index = self._positions[team]
+        return block.reviewees(index)
+
+    def items(self) -> Iterator[tuple[str, list[str]]]:
+        for block in self.blocks:
+            for index, team in enumerate(block.order):
+                yield team, block.reviewees(index)
+
+    def as_dict(self) -> dict[str, list[str]]:
+        return dict(self.items())
+
+
+def _cyclic(teams: list[str], size: int, rng: random.Random) -> Block:
+    order = teams[:]
+    rng.shuffle(order)
+    return Block(order=order, offsets=list(range(1, size + 1)))
+
+
+def _random(teams: list[str], size: int, rng: random.Random) -> Block:
+    # Every offset in 1..n-1 is a derangement of the order, and distinct offsets never
+    # pick the same team twice, so each team reviews and is reviewed exactly `size` times.
+    order = teams[:]
+    rng.shuffle(order)
+    return Block(order=order, offsets=sorted(rng.sample(range(1, len(order)), size)))
+
+
+def _repeats(block: Block, history: set[tuple[str, str]]) -> int:
+    return sum(
+        (team, reviewee) in history
+        for index, team in enumerate(block.order)
+        for reviewee in block.reviewees(index)
+    )
+
+
+def _cost(block: Block, positions: set[int], history: set[tuple[str, str]]) -> int:
+    """Repeated pairs in which a team at one of `positions` is the reviewer or reviewee."""
+    n = len(block.order)
+    pairs = {
+        pair
+        for position in positions
+        for offset in block.offsets
+        for pair in (
+            (position, (position + offset) % n),
+            ((position - offset) % n, position),
+        )
+    }
+    return sum((block.order[a], block.order[b]) in history for a, b in pairs)
+
+
+def _repair(block: Block, history: set[tuple[str, str]], rng: random.Random) -> None:
+    """Swap teams around while that removes repeated pairs. Each swap costs O(size)."""
+    order = block.order
+    n = len(order)
+    for position in range(n):
+        if not _cost(block, {position}, history):
+            continue
+
+        for _ in range(SWAPS):
+            other = rng.randrange(n)
+            before = _cost(block, {position, other}, history)
+            order[position], order[other] = order[other], order[position]
+            if _cost(block, {position, other}, history) < before:
+                break
+            order[position], order[other] = order[other], order[position]
+
+
+def _avoid_previous(
+    teams: list[str], size: int, rng: random.Random, history: set[tuple[str, str]]
+) -> Block:
+    if not history:
+        return _random(teams, size, rng)
+
+    best, best_repeats = None, None
+    for _ in range(ATTEMPTS):
+        block = _random(teams, size, rng)
+        repeats = _repeats(block, history)
+        if best is None or repeats < best_repeats:
+            best, best_repeats = block, repeats
+        if not best_repeats:
+            return best
+
+    _repair(best, history, rng)
+    return best
+
+
+def _sections(
+    teams: list[str], size: int, sections: dict[str, str | None]
+) -> list[list[str]]:
+    """Group teams by section. Sections too small to review among themselves are merged."""
+    groups = defaultdict(list)
+    for team in teams:
+        groups[sections.get(team)].append(team)
+
+    result, remainder = [], []
+    for key in sorted(groups, key=str):
+        (result if len(groups[key]) > size else remainder).append(groups[key])
+
+    merged = [team for group in remainder for team in group]
+    if merged:
+        if len(merged) > size or not result:
+            result.append(merged)
+        else:
+            result[-1].extend(merged)
+    return result
+
+
+STRATEGIES = ("cyclic", "random", "avoid_previous", "section")
+
+
+def distribute(
+    teams: list[str],
+    size: int,
+    strategy: str = "cyclic",
+    seed: int = None,
+    history: set[tuple[str, str]] = None,
+    sections: dict[str, str | None] = None,
+) -> Distribution:
+    """Assign each team `size` other teams to review, each team being reviewed `size` times.
+
+    - cyclic: shuffle the teams and review the next `size` teams in the list.
+    - random: shuffle the teams and review teams at `size` random distinct offsets.
+    - avoid_previous: like random, but keep the candidate repeating the fewest
+      (reviewer, reviewee) pairs found in `history`, then swap teams to remove repeats.
+    - section: like avoid_previous, but within each section of `sections`.
+
+    Runs in O(teams * size) time. Raises ValueError if `size` is not smaller than the
+    number of teams.
+    """
+    if not 0 < size < len(teams):
+        raise ValueError(
+            "Peer review size must be between 1 and the number of teams - 1."
+        )
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown distribution strategy '{strategy}'.")
+
+    if seed is None:
+        seed = random.randrange(2**32)
+    rng = random.Random(seed)
+    teams = sorted(teams)
+    history = history or set()
+
+    builders: dict[str, Callable[[list[str]], Block]] = {
+        "cyclic": lambda group: _cyclic(group, size, rng),
+        "random": lambda group: _random(group, size, rng),
+        "avoid_previous": lambda group: _avoid_previous(group, size, rng, history),
+        "section": lambda group: _avoid_previous(group, size, rng, history),
+    }
+
+    groups = [teams]
+    if strategy == "section":
+        groups = _sections(teams, size, sections or {})
+
+    return Distribution(
+        blocks=[builders[strategy](group) for group in groups], seed=seed
+    )
+
+
+# Distributions are stored in the `distributions` collection, one document per
+# (guild, assignment, version) holding `reviews: [{reviewer, reviewees}]`. The highest
+# version of an assignment is the current one, older versions are kept as history.
+
+
+async def save(
+    guild_id: int, assignment: str, distribution: Distribution, strategy: str
+) -> int:
+    """Store a distribution as the new version for an assignment and return the version.
+
+    The distribution is a single document, so it becomes visible all at once.
+    """
+    collection = database.Database().get_collection("distributions")
+    query = {"guild_id": guild_id, "assignment": assignment}
+    while True:
+        latest = await collection.find_one(
+            query, {"version": 1}, sort=[("version", -1)]
+        )
+        document = {
+            "guild_id": guild_id,
+            "assignment": assignment,
+            "version": latest["version"] + 1 if latest else 1,
+            "strategy": strategy,
+            "seed": distribution.seed,
+            "created_on": time.time(),
+            "reviews": [
+                {"reviewer": team, "reviewees": reviewees}
+                for team, reviewees in distribution.items()
+            ],
+        }
+        try:
+            await collection.insert_one(document)
+        except DuplicateKeyError:
+            # Another distribution for the same assignment was saved concurrently.
+            continue
+        return document["version"]
+
+
+async def get_reviewees(guild_id: int, assignment: str, team: str) -> list[str]:
+    """Teams that a team reviews for an assignment, empty if it was not distributed."""
+    collection = database.Database().get_collection("distributions")
+    query = {"guild_id": guild_id, "assignment": assignment}
+    projection = {"version": 1, "reviews": {"$elemMatch": {"reviewer": team}}}
+    result = await collection.find_one(query, projection, sort=[("version", -1)])
+    if not result or not result.get("reviews"):
+        return []
+    return result["reviews"][0]["reviewees"]
+
+
+async def get_history(guild_id: int) -> set[tuple[str, str]]:
+    """Every (reviewer, reviewee) pair of the current distribution of each assignment."""
+    collection = database.Database().get_collection("distributions")
+    pipeline = [
+        {"$match": {"guild_id": guild_id}},
+        {"$sort": {"assignment": 1, "version": -1}},
+        {"$group": {"_id": "$assignment", "reviews": {"$first": "$reviews"}}},
+    ]
+    results = await collection.aggregate(pipeline).to_list()
+    return {
+        (review["reviewer"], reviewee)
+        for result in results
+        for review in result["reviews"]
+        for reviewee in review["reviewees"]
+    }
+
+
+async def rename_team(guild_id: int, name: str, new_name: str) -> None:
+    collection = database.Database().get_collection("distributions")
+    await collection.update_many(
+        {"guild_id": guild_id, "reviews.reviewer": name},
+        {"$set": {"reviews.$[review].reviewer": new_name}},
+        array_filters=[{"review.reviewer": name}],
+    )
+    await collection.update_many(
+        {"guild_id": guild_id, "reviews.reviewees": name},
+        {"$set": {"reviews.$[].reviewees.$[reviewee]": new_name}},
+        array_filters=[{"reviewee": name}],
+    )
+
+
+async def remove_team(guild_id: int, name: str) -> None:
+    collection = database.Database().get_collection("distributions")
+    await collection.update_many(
+        {"guild_id": guild_id, "reviews.reviewer": name},
+        {"$pull": {"reviews": {"reviewer": name}}},
+    )
+    await collection.update_many(
+        {"guild_id": guild_id, "reviews.reviewees": name},
+        {"$pull": {"reviews.$[].reviewees": name}},
+    )
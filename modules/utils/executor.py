@@ -0,0 +1,111 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import threading
+import time
+from typing import Any, Callable, TypeVar
+
+import confuse
+
+from modules.utils.config import config
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Pool:
+    """Named thread pool for one kind of blocking work, with queue and timing metrics.
+
+    Each kind of work gets its own pool so that, for example, a burst of slow disk I/O
+    cannot delay database queries.
+    """
+
+    def __init__(self, name: str, workers: int) -> None:
+        self.name = name
+        self.workers = workers
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=f"{name}-pool"
+        )
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    def _call(self, submitted_on: float, func: Callable[[], T]) -> T:
+        started_on = time.monotonic()
+        wait = started_on - submitted_on
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.started += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+        failed = True
+        try:
+            result = func()
+            failed = False
+            return result
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.failed += failed
+                self.total_run += time.monotonic() - started_on
+
+    async def run(self, func: Callable[..., T], *args, **kwargs) -> T:
+        """Run a blocking callable in this pool and wait for its result."""
+        with self._lock:
+            self.queued += 1
+        future = self._executor.submit(
+            self._call, time.monotonic(), functools.partial(func, *args, **kwargs)
+        )
+        future.add_done_callback(self._done)
+        return await asyncio.wrap_future(future)
+
+    def _done(self, future: concurrent.futures.Future) -> None:
+        # A future is only cancelled if it never started, so _call() never dequeued it.
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "queued": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "average_wait_ms": self.total_wait / max(self.started, 1) * 1000,
+                "max_wait_ms": self.max_wait * 1000,
+                "average_run_ms": self.total_run / max(self.completed, 1) * 1000,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+def _workers(key: str, default: int) -> int:
+    return config["executor"][key].get(confuse.Integer(default=default))
+
+
+database = Pool("database", _workers("database_workers", 16))
+filesystem = Pool("filesystem", _workers("filesystem_workers", 4))
+http = Pool("http", _workers("http_workers", 8))
+compute = Pool("compute", _workers("compute_workers", 2))
+
+pools = (database, filesystem, http, compute)
+
+
+def shutdown() -> None:
+    for pool in pools:
+        pool.shutdown()
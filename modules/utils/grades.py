@@ -0,0 +1,226 @@
+import csv
+import itertools
+import logging
+import pathlib
+import tempfile
+import time
+from typing import Any, Mapping
+
+from pymongo import DESCENDING, DeleteOne, ReturnDocument
+from pymongo.command_cursor import CommandCursor
+
+from modules.utils import database, executor, scoring
+
+log = logging.getLogger(__name__)
+
+# Grades are keyed by (guild_id, assignment, team, reviewer). The reviewer is the name of
+# the reviewing team, or None for the grade given by an instructor. Grades saved before
+# reviewers were recorded are flagged `legacy` until an instructor grades the team again,
+# as they may have been given by a student.
+
+# Grades read from the cursor and written to the export file at a time.
+BATCH_SIZE = 1000
+
+# Cells starting with one of these are evaluated by spreadsheet applications.
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+COLUMNS = (
+    "assignment",
+    "team",
+    "reviewer",
+    "points",
+    "max_points",
+    "graded_by",
+    "graded_on",
+)
+
+
+async def get_grade(
+    guild_id: int, assignment: str, team: str, reviewer: str | None
+) -> Mapping[str, Any] | None:
+    collection = database.Database().get_collection("grades")
+    query = {
+        "guild_id": guild_id,
+        "assignment": assignment,
+        "team": team,
+        "reviewer": reviewer,
+    }
+    return await collection.find_one(query)
+
+
+async def set_grade(
+    guild_id: int,
+    assignment: str,
+    team: str,
+    reviewer: str | None,
+    points: int,
+    graded_by: int,
+) -> Mapping[str, Any]:
+    """Create or update a grade in one round trip and return the stored grade.
+
+    The calibrated scores of the assignment are updated in the background.
+    """
+    collection = database.Database().get_collection("grades")
+    query = {
+        "guild_id": guild_id,
+        "assignment": assignment,
+        "team": team,
+        "reviewer": reviewer,
+    }
+    new_value = {
+        "$set": {"points": points, "graded_by": graded_by, "graded_on": time.time()},
+        "$unset": {"legacy": ""},
+    }
+    result = await collection.find_one_and_update(
+        query, new_value, upsert=True, return_document=ReturnDocument.AFTER
+    )
+    scoring.engine.update(guild_id, assignment, team, reviewer, points)
+    return result
+
+
+async def rename_team(guild_id: int, name: str, new_name: str) -> None:
+    collection = database.Database().get_collection("grades")
+    for key in ("team", "reviewer"):
+        await collection.update_many(
+            {"guild_id": guild_id, key: name}, {"$set": {key: new_name}}
+        )
+    await scoring.engine.rename_team(guild_id, name, new_name)
+
+
+async def remove_team(guild_id: int, name: str) -> None:
+    """Delete the grades given to and by a team, so that a new team with the same name
+    starts without any. Assignments it was graded in are scored again without it.
+    """
+    collection = database.Database().get_collection("grades")
+    query = {"guild_id": guild_id, "$or": [{"team": name}, {"reviewer": name}]}
+    assignments = await collection.distinct("assignment", query)
+    await collection.delete_many(query)
+    scoring.engine.remove_team(guild_id, assignments)
+
+
+async def migrate() -> None:
+    """Bring grades stored before the unique (guild, assignment, team, reviewer) key in line.
+
+    Older grades saved the assignment as `name` and had no reviewer. Anyone who could
+    open the grading menu wrote that single grade, so they are kept as the grade without a
+    reviewer but flagged `legacy`, which calibration does not use as an instructor grade.
+    Duplicates that the old lookup created are removed, keeping the most recent one, so
+    that the unique index can be built.
+    """
+    collection = database.Database().get_collection("grades")
+    query = {"assignment": {"$exists": False}, "name": {"$exists": True}}
+    renamed = await collection.update_many(query, {"$rename": {"name": "assignment"}})
+    query = {"reviewer": {"$exists": False}}
+    await collection.update_many(query, {"$set": {"reviewer": None, "legacy": True}})
+
+    pipeline = [
+        {"$sort": {"_id": DESCENDING}},
+        {
+            "$group": {
+                "_id": {
+                    "guild_id": "$guild_id",
+                    "assignment": "$assignment",
+                    "team": "$team",
+                    "reviewer": "$reviewer",
+                },
+                "ids": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    duplicates = [
+        DeleteOne({"_id": _id})
+        async for result in collection.aggregate(pipeline)
+        for _id in result["ids"][1:]
+    ]
+    if duplicates:
+        await collection.bulk_write(duplicates, ordered=False)
+
+    if renamed.modified_count or duplicates:
+        log.info(
+            f"Migrated {renamed.modified_count} grades and removed {len(duplicates)} duplicates."
+        )
+
+
+def _escape(value: Any) -> Any:
+    """Keep spreadsheets from running a cell, such as a team name, as a formula."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def _next_batch(cursor: CommandCursor) -> list[Mapping[str, Any]]:
+    return [
+        {key: _escape(value) for key, value in document.items()}
+        for document in itertools.islice(cursor, BATCH_SIZE)
+    ]
+
+
+async def export(guild_id: int) -> pathlib.Path:
+    """Gradebook of a guild as a CSV file, one row per grade, from a single aggregation.
+
+    CSV rather than XLSX, as it can be written row by row with the standard library and
+    opens in any spreadsheet application. Rows are written to a temporary file a batch at
+    a time as they come off the cursor, so memory does not grow with the number of
+    grades. The caller deletes the file.
+    """
+    collection = database.Database().get_collection("grades")
+    pipeline = [
+        {"$match": {"guild_id": guild_id}},
+        {"$sort": {"assignment": 1, "team": 1, "reviewer": 1}},
+        {
+            "$lookup": {
+                "from": "assignments",
+                "let": {"assignment": "$assignment"},
+                "pipeline": [
+                    {
+                        "$match": {
+                            "guild_id": guild_id,
+                            "$expr": {"$eq": ["$name", "$$assignment"]},
+                        }
+                    },
+                    {"$project": {"_id": 0, "points": 1}},
+                ],
+                "as": "assignment_result",
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "assignment": 1,
+                "team": 1,
+                "reviewer": 1,
+                "points": 1,
+                "max_points": {"$arrayElemAt": ["$assignment_result.points", 0]},
+                "graded_by": 1,
+                "graded_on": {"$toDate": {"$multiply": ["$graded_on", 1000]}},
+            }
+        },
+    ]
+    cursor = await executor.database.run(
+        collection.collection.aggregate, pipeline, batchSize=BATCH_SIZE
+    )
+    file = await executor.filesystem.run(
+        tempfile.NamedTemporaryFile,
+        mode="w",
+        newline="",
+        encoding="utf-8",
+        suffix=".csv",
+        delete=False,
+    )
+    path = pathlib.Path(file.name)
+    try:
+        try:
+            writer = csv.DictWriter(file, fieldnames=COLUMNS, extrasaction="ignore")
+            await executor.filesystem.run(writer.writeheader)
+            while batch := await executor.database.run(_next_batch, cursor):
+                await executor.filesystem.run(writer.writerows, batch)
+        finally:
+            await executor.database.run(cursor.close)
+            await executor.filesystem.run(file.close)
+    except BaseException:
+        await executor.filesystem.run(path.unlink, missing_ok=True)
+        raise
+
+    return path
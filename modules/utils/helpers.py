@@ -1,18 +1,51 @@
 import logging
+from collections import defaultdict
+from typing import Any, Mapping
 
 import arrow
 import discord
 from discord.app_commands import AppCommand, AppCommandGroup
 
-from modules.utils import database, embeds
+from modules.utils import cache, cooldown, database, embeds, membership
 
 log = logging.getLogger(__name__)
 
+# Settings rarely change and are read by almost every check, so keep them in memory.
+# Views that update the settings document call invalidate_settings() right after writing.
+settings_cache = cache.TTLCache(ttl=300)
+# Bumped on every invalidation so that a read racing with a write can be detected.
+settings_versions: defaultdict[int, int] = defaultdict(int)
+
+
+async def get_settings(guild_id: int) -> Mapping[str, Any] | None:
+    while guild_id not in settings_cache:
+        version = settings_versions[guild_id]
+        collection = database.Database().get_collection("settings")
+        query = {"guild_id": guild_id}
+        result = await collection.find_one(query)
+
+        # Settings were written while the query was running, the result may be stale.
+        if version == settings_versions[guild_id]:
+            settings_cache.set(guild_id, result)
+            return result
+
+    return settings_cache.get(guild_id)
+
+
+def invalidate_settings(guild_id: int) -> None:
+    settings_versions[guild_id] += 1
+    settings_cache.invalidate(guild_id)
+
+
+# Application commands keyed by (command, subcommand_group, subcommand), used for mentions.
+# Fetching them is an HTTP request, so it is only done on startup and after a sync.
+command_registry: dict[
+    tuple[str, str | None, str | None], AppCommand | AppCommandGroup
+] = {}
+
 
 async def instructor_check(interaction: discord.Interaction) -> discord.Embed | None:
-    collection = database.Database().get_collection("settings")
-    query = {"guild_id": interaction.guild_id}
-    result = collection.find_one(query)
+    result = await get_settings(interaction.guild_id)
 
     embed = embeds.make_embed(
         interaction=interaction,
@@ -39,7 +72,7 @@ async def instructor_check(interaction: discord.Interaction) -> discord.Embed |
 async def course_check(interaction: discord.Interaction) -> discord.Embed | None:
     collection = database.Database().get_collection("courses")
     query = {"guild_id": interaction.guild_id}
-    result = collection.find_one(query)
+    result = await collection.find_one(query)
     if result is None:
         return embeds.make_embed(
             interaction=interaction,
@@ -54,9 +87,7 @@ async def course_check(interaction: discord.Interaction) -> discord.Embed | None
 async def role_availability_check(
     interaction: discord.Interaction,
 ) -> discord.Embed | None:
-    collection = database.Database().get_collection("settings")
-    query = {"guild_id": interaction.guild_id}
-    result = collection.find_one(query)
+    result = await get_settings(interaction.guild_id)
     if result is None:
         return embeds.make_embed(
             interaction=interaction,
@@ -70,9 +101,7 @@ async def role_availability_check(
 
 
 async def team_lock_check(interaction: discord.Interaction) -> discord.Embed | None:
-    collection = database.Database().get_collection("settings")
-    query = {"guild_id": interaction.guild_id}
-    result = collection.find_one(query)
+    result = await get_settings(interaction.guild_id)
 
     if result and any(result["role_id"] == role.id for role in interaction.user.roles):
         return
@@ -101,9 +130,9 @@ async def team_lock_check(interaction: discord.Interaction) -> discord.Embed | N
 
 
 async def team_check(interaction: discord.Interaction) -> discord.Embed | None:
-    collection = database.Database().get_collection("teams")
-    query = {"guild_id": interaction.guild_id, "members": interaction.user.id}
-    result = collection.find_one(query)
+    result = await membership.index.get_team(
+        guild_id=interaction.guild_id, user_id=interaction.user.id
+    )
 
     if result is None:
         create_team = await get_command(
@@ -123,26 +152,28 @@ async def team_check(interaction: discord.Interaction) -> discord.Embed | None:
 
 
 async def cooldown_check(
-    interaction: discord.Interaction, command: str
+    interaction: discord.Interaction, command: str, consume: bool = True
 ) -> discord.Embed | None:
-    settings_collection = database.Database().get_collection("settings")
-    settings_query = {"guild_id": interaction.guild_id}
-    settings_result = settings_collection.find_one(settings_query)
+    """Use a command once, or return an error embed if it is on cooldown.
+
+    Checking and using the command is a single step, so the same cooldown cannot be
+    used twice by requests that are checked before either of them is counted.
+    With `consume=False` the cooldown is only checked, e.g. before showing a modal.
+    Instructors are never on cooldown.
+    """
+    settings_result = await get_settings(interaction.guild_id)
     if settings_result and any(
         settings_result["role_id"] == role.id for role in interaction.user.roles
     ):
         return
 
-    task_collection = database.Database().get_collection("tasks")
-    task_query = {
-        "guild_id": interaction.guild_id,
-        "user_id": interaction.user.id,
-        "command": command,
-    }
-    task_result = task_collection.find_one(task_query)
-    if task_result and task_result["remaining"] == 0:
+    method = cooldown.manager.consume if consume else cooldown.manager.retry_after
+    retry_after = method(
+        guild_id=interaction.guild_id, user_id=interaction.user.id, command=command
+    )
+    if retry_after:
         present = arrow.utcnow()
-        future = present.shift(seconds=task_result["ready_on"] - present.timestamp())
+        future = present.shift(seconds=retry_after)
         duration_string = future.humanize(
             present, only_distance=True, granularity=["hour", "minute", "second"]
         )
@@ -168,44 +199,23 @@ async def bot_owner_check(interaction: discord.Interaction) -> discord.Embed | N
         )
 
 
-async def set_cooldown(interaction: discord.Interaction, command: str) -> None:
-    setting_collection = database.Database().get_collection("settings")
-    setting_query = {"guild_id": interaction.guild_id}
-    setting_result = setting_collection.find_one(setting_query)
-    if setting_result and any(
-        setting_result["role_id"] == role.id for role in interaction.user.roles
-    ):
-        return
-
-    cooldown_collection = database.Database().get_collection("cooldown")
-    cooldown_query = {"guild_id": interaction.guild_id, "command": command}
-    cooldown_result = cooldown_collection.find_one(cooldown_query)
-    if cooldown_result is None:
-        return
+async def refresh_commands(client: discord.Client) -> None:
+    """Rebuild the command registry from the application commands registered on Discord."""
+    registry = {}
+    for value in await client.tree.fetch_commands():
+        registry[(value.name, None, None)] = value
+        for option in value.options:
+            if not isinstance(option, AppCommandGroup):
+                continue
 
-    task_collection = database.Database().get_collection("tasks")
-    task_query = {
-        "guild_id": interaction.guild_id,
-        "user_id": interaction.user.id,
-        "command": command,
-    }
-    tasks_result = task_collection.find_one(task_query)
-    if tasks_result:
-        remaining = (
-            tasks_result["remaining"] - 1 if tasks_result["remaining"] > 1 else 0
-        )
-        new_value = {"$set": {"remaining": remaining}}
-        task_collection.update_one(task_query, new_value)
+            registry[(value.name, option.name, None)] = option
+            for item in option.options:
+                if isinstance(item, AppCommandGroup):
+                    registry[(value.name, option.name, item.name)] = item
 
-    timestamp = arrow.utcnow().timestamp()
-    task_document = {
-        "guild_id": interaction.guild_id,
-        "user_id": interaction.user.id,
-        "command": command,
-        "ready_on": timestamp + cooldown_result["per"],
-        "remaining": cooldown_result["rate"] - 1,
-    }
-    task_collection.insert_one(task_document)
+    command_registry.clear()
+    command_registry.update(registry)
+    log.info(f"Cached {len(command_registry)} application commands.")
 
 
 async def get_command(
@@ -214,23 +224,8 @@ async def get_command(
     subcommand_group: str = None,
     subcommand: str = None,
 ) -> AppCommand | AppCommandGroup:
-    app_commands = await interaction.client.tree.fetch_commands()
-    for index, value in enumerate(app_commands):
-        if value.name == command and subcommand_group is None:
-            return value
+    # The registry is built on startup, it is only empty if fetching it failed there.
+    if not command_registry:
+        await refresh_commands(interaction.client)
 
-        for option in value.options:
-            if (
-                value.name == command
-                and option.name == subcommand_group
-                and subcommand is None
-            ):
-                return option
-
-            for item in option.options:
-                if (
-                    value.name == command
-                    and option.name == subcommand_group
-                    and item.name == subcommand
-                ):
-                    return item
+    return command_registry.get((command, subcommand_group, subcommand))
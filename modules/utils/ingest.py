@@ -0,0 +1,185 @@
+import asyncio
+import hashlib
+import logging
+import os
+import pathlib
+import secrets
+import shutil
+import tempfile
+from collections import defaultdict
+
+import aiohttp
+import confuse
+import discord
+
+from modules.utils import bundles, executor, metadata, storage, uploads
+from modules.utils.config import config
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1 << 20
+
+# Bytes of new content each guild is storing right now but has not recorded yet. Quota
+# checks count them and hold the guild's lock, so concurrent uploads cannot all pass.
+_reserved: defaultdict[int, int] = defaultdict(int)
+_quota_locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+
+
+class IngestError(Exception):
+    """An attachment was rejected. The message is meant to be shown to the user."""
+
+
+def _limits() -> tuple[int, int]:
+    options = config["uploads"]
+    max_file_size = options["max_file_size"].get(confuse.Integer(default=25 << 20))
+    guild_quota = options["guild_quota"].get(confuse.Integer(default=1 << 30))
+    return max_file_size, guild_quota
+
+
+def _format_size(size: int) -> str:
+    return f"{size / (1 << 20):.1f} MB"
+
+
+def blob_dir(guild_id: int) -> pathlib.Path:
+    return storage.ROOT.joinpath(str(guild_id), ".blobs")
+
+
+def blob_path(guild_id: int, digest: str) -> pathlib.Path:
+    return blob_dir(guild_id).joinpath(digest[:2], digest)
+
+
+def _place(
+    guild_id: int, temp: pathlib.Path, digest: str, destination: pathlib.Path
+) -> bool:
+    """Blocking part of ingest(). Returns whether an existing file was replaced."""
+    blob = blob_path(guild_id, digest)
+    blob.parent.mkdir(parents=True, exist_ok=True)
+    # Linking fails if the same content was stored concurrently, which is fine.
+    try:
+        os.link(temp, blob)
+    except FileExistsError:
+        pass
+
+    previous = None
+    if destination.is_file():
+        previous = blob_path(guild_id, uploads.fingerprint(destination)[2])
+        # Same content, and renaming a hard link onto itself would be a no-op anyway.
+        if previous == blob:
+            return True
+
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    staging = destination.with_name(f".{destination.name}.{secrets.token_hex(4)}.tmp")
+    try:
+        os.link(blob, staging)
+    except OSError:
+        shutil.copy2(blob, staging)
+    os.replace(staging, destination)
+
+    # The replaced file was the last reference to its blob.
+    if previous is not None and previous.is_file():
+        if previous.stat().st_nlink == 1:
+            previous.unlink()
+            log.info(f"Removed orphaned blob '{previous.name}' of guild {guild_id}.")
+
+    return previous is not None
+
+
+async def _reserve(guild_id: int, size: int, quota: int) -> None:
+    """Count `size` new bytes toward the guild's quota until _release() is called."""
+    async with _quota_locks[guild_id]:
+        used = (
+            await metadata.usage(guild_id)
+            + await bundles.usage(guild_id)
+            + _reserved[guild_id]
+        )
+        if used + size > quota:
+            raise IngestError(
+                f"This server has used up its storage quota of {_format_size(quota)}."
+            )
+        _reserved[guild_id] += size
+
+
+def _release(guild_id: int, size: int) -> None:
+    _reserved[guild_id] -= size
+    if not _reserved[guild_id]:
+        del _reserved[guild_id]
+
+
+async def ingest(
+    attachment: discord.Attachment,
+    guild_id: int,
+    directory: pathlib.Path,
+    uploader: int,
+) -> bool:
+    """Store an attachment in `directory`. Returns whether an existing file was replaced.
+
+    The attachment is streamed to a temporary file in chunks while being hashed, and
+    rejected with IngestError if it is larger than `max_file_size` or would exceed the
+    guild's `guild_quota`, which also counts cached bundles and uploads in progress.
+    Contents are stored once per guild under `.blobs`, named by their hash, and hard
+    linked into place with an atomic rename, so resubmitting the same file costs no
+    extra space. The file is then recorded in the upload index.
+    """
+    max_file_size, quota = _limits()
+    if attachment.size > max_file_size:
+        raise IngestError(
+            f"Attachments cannot be larger than {_format_size(max_file_size)}."
+        )
+
+    destination = directory.joinpath(pathlib.PurePath(attachment.filename).name)
+    temp_dir = blob_dir(guild_id)
+    await executor.filesystem.run(temp_dir.mkdir, parents=True, exist_ok=True)
+    file = await executor.filesystem.run(
+        tempfile.NamedTemporaryFile, dir=temp_dir, suffix=".tmp", delete=False
+    )
+    temp = pathlib.Path(file.name)
+    digest = hashlib.sha256()
+    mime_types = []
+
+    def write(chunk: bytes) -> None:
+        if not mime_types:
+            mime_types.append(metadata.sniff(chunk))
+        file.write(chunk)
+        digest.update(chunk)
+
+    try:
+        try:
+            size = 0
+            session = uploads.uploader.get_session()
+            async with session.get(attachment.url) as response:
+                response.raise_for_status()
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > max_file_size:
+                        raise IngestError(
+                            f"Attachments cannot be larger than {_format_size(max_file_size)}."
+                        )
+                    await executor.filesystem.run(write, chunk)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            log.error(f"Unable to download '{attachment.filename}': {error!r}")
+            raise IngestError("Unable to download the attachment, please try again.")
+        finally:
+            await executor.filesystem.run(file.close)
+
+        # Content already in the blob store takes no extra space.
+        blob = blob_path(guild_id, digest.hexdigest())
+        reserved = 0 if await executor.filesystem.run(blob.is_file) else size
+        if reserved:
+            await _reserve(guild_id, reserved, quota)
+
+        try:
+            replaced = await executor.filesystem.run(
+                _place, guild_id, temp, digest.hexdigest(), destination
+            )
+            mime_type = mime_types[0] if mime_types else "application/x-empty"
+            await metadata.record(
+                guild_id, destination, size, mime_type, digest.hexdigest(), uploader
+            )
+        finally:
+            # Recorded files are counted by metadata.usage() from now on.
+            if reserved:
+                _release(guild_id, reserved)
+    finally:
+        await executor.filesystem.run(temp.unlink, missing_ok=True)
+
+    return replaced
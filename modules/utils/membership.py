@@ -0,0 +1,209 @@
+import logging
+from typing import Any, Mapping
+
+from pymongo import ASCENDING, ReturnDocument, UpdateMany
+from pymongo.errors import DuplicateKeyError
+
+from modules.utils import cache, database
+
+log = logging.getLogger(__name__)
+
+
+class MembershipIndex(cache.GuildIndex[dict[int, str]]):
+    """Per-guild map of user id to team name.
+
+    A guild is loaded from the teams collection the first time it is looked up. After that
+    the views that change team membership keep it up to date through add(), remove(),
+    rename() and drop(), so a lookup never queries the database.
+    """
+
+    async def _load(self, guild_id: int) -> dict[int, str]:
+        collection = database.Database().get_collection("teams")
+        query = {"guild_id": guild_id}
+        return {
+            member: team["name"]
+            async for team in collection.find(query, {"name": 1, "members": 1})
+            for member in team["members"]
+        }
+
+    async def get_team(self, guild_id: int, user_id: int) -> str | None:
+        """Name of the team the user is in, or None if they are not in any team."""
+        members = await self._get(guild_id)
+        return members.get(user_id)
+
+    def add(self, guild_id: int, user_id: int, team: str) -> None:
+        self._touch(guild_id)
+        if guild_id in self.guilds:
+            self.guilds[guild_id][user_id] = team
+
+    def remove(self, guild_id: int, user_id: int) -> None:
+        self._touch(guild_id)
+        if guild_id in self.guilds:
+            self.guilds[guild_id].pop(user_id, None)
+
+    def rename(self, guild_id: int, name: str, new_name: str) -> None:
+        self._touch(guild_id)
+        members = self.guilds.get(guild_id, {})
+        for user_id, team in members.items():
+            if team == name:
+                members[user_id] = new_name
+
+    def drop(self, guild_id: int, team: str) -> None:
+        self._touch(guild_id)
+        members = self.guilds.get(guild_id, {})
+        for user_id in [key for key, value in members.items() if value == team]:
+            del members[user_id]
+
+
+index = MembershipIndex()
+
+
+class MembershipError(Exception):
+    """A membership change was rejected. The message is meant to be shown to the user.
+
+    `left` is the team the user was moved out of without being put back, if any.
+    """
+
+    def __init__(self, message: str, left: Mapping[str, Any] | None = None) -> None:
+        super().__init__(message)
+        self.left = left
+
+
+async def join(
+    guild_id: int, user_id: int, team: str, team_size: int
+) -> tuple[Mapping[str, Any], Mapping[str, Any] | None]:
+    """Add a user to a team, moving them out of their current team.
+
+    The target team is checked first, so a team that is gone, full or already has the
+    user is reported without touching the current team. The unique members index keeps a
+    user in at most one team, so the current team is then left before joining. The size
+    check and the insert are one conditional update: the team only matches while it has
+    no member at index `team_size - 1`, so concurrent joins cannot overfill it. If a
+    concurrent join took the last spot in between, the user is put back into the team
+    they left under the same size guard. Returns the joined team and the team that was
+    left, raises MembershipError if the user could not join.
+    """
+    collection = database.Database().get_collection("teams")
+    query = {"guild_id": guild_id, "name": team}
+    target = await collection.find_one(query, {"members": 1})
+    if target is None:
+        raise MembershipError(
+            f"Cannot join the team '{team}' because it no longer exists."
+        )
+    if user_id in target["members"]:
+        raise MembershipError(f"You are already in the team '{team}'.")
+    if len(target["members"]) >= team_size:
+        raise MembershipError(f"Cannot join the team '{team}' because it is full.")
+
+    query = {"guild_id": guild_id, "name": {"$ne": team}, "members": user_id}
+    left = await collection.find_one_and_update(query, {"$pull": {"members": user_id}})
+
+    query = {
+        "guild_id": guild_id,
+        "name": team,
+        "members": {"$ne": user_id},
+        f"members.{team_size - 1}": {"$exists": False},
+    }
+    try:
+        joined = await collection.find_one_and_update(
+            query,
+            {"$addToSet": {"members": user_id}},
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # The user was added to another team in the meantime.
+        joined = None
+
+    if joined is not None:
+        index.add(guild_id=guild_id, user_id=user_id, team=team)
+        return joined, left
+
+    if left is not None and not await _rejoin(collection, left, user_id, team_size):
+        index.remove(guild_id=guild_id, user_id=user_id)
+        raise MembershipError(
+            f"Cannot join the team '{team}' because it was filled or removed in the "
+            f"meantime. Your spot in the team '{left['name']}' was taken as well, "
+            "so you are no longer in any team.",
+            left=left,
+        )
+
+    raise MembershipError(
+        f"Cannot join the team '{team}' because it was filled or removed in the meantime."
+    )
+
+
+async def _rejoin(
+    collection: database.AsyncCollection,
+    team: Mapping[str, Any],
+    user_id: int,
+    team_size: int,
+) -> bool:
+    """Undo leaving a team. The spot may have been taken since, so the size is checked
+    like in join(). Returns False if the user could not be put back.
+    """
+    query = {
+        "_id": team["_id"],
+        "members": {"$ne": user_id},
+        f"members.{team_size - 1}": {"$exists": False},
+    }
+    try:
+        result = await collection.update_one(query, {"$addToSet": {"members": user_id}})
+    except DuplicateKeyError:
+        # The user is in another team by now, and whatever added them updated the index.
+        return True
+    return bool(result.modified_count)
+
+
+async def is_member(guild_id: int, user_id: int) -> bool:
+    """Whether a user is in a team, read from the database rather than the index."""
+    collection = database.Database().get_collection("teams")
+    query = {"guild_id": guild_id, "members": user_id}
+    return bool(await collection.count_documents(query, limit=1))
+
+
+async def leave(guild_id: int, user_id: int) -> Mapping[str, Any] | None:
+    """Remove a user from their team. Returns the team that was left, if any."""
+    collection = database.Database().get_collection("teams")
+    query = {"guild_id": guild_id, "members": user_id}
+    left = await collection.find_one_and_update(query, {"$pull": {"members": user_id}})
+    index.remove(guild_id=guild_id, user_id=user_id)
+    return left
+
+
+async def migrate() -> None:
+    """Bring teams in line with the unique (guild_id, members) index.
+
+    Users that are in several teams, which older versions allowed, stay in the team that
+    was created first and are removed from the others. The non-unique index of older
+    versions is dropped so that ensure_indexes() can build the unique one.
+    """
+    collection = database.Database().get_collection("teams")
+    pipeline = [
+        {"$sort": {"_id": ASCENDING}},
+        {"$unwind": "$members"},
+        {
+            "$group": {
+                "_id": {"guild_id": "$guild_id", "member": "$members"},
+                "teams": {"$push": "$_id"},
+                "count": {"$sum": 1},
+            }
+        },
+        {"$match": {"count": {"$gt": 1}}},
+    ]
+    duplicates = [
+        UpdateMany(
+            {"_id": {"$in": result["teams"][1:]}},
+            {"$pull": {"members": result["_id"]["member"]}},
+        )
+        async for result in collection.aggregate(pipeline)
+    ]
+    if duplicates:
+        await collection.bulk_write(duplicates, ordered=False)
+        log.info(f"Removed {len(duplicates)} users from teams they were in twice.")
+
+    existing = await collection.index_information()
+    if "guild_id_members" in existing and not existing["guild_id_members"].get(
+        "unique"
+    ):
+        await collection.drop_index("guild_id_members")
+        log.info("Dropped the non-unique members index of teams.")
@@ -0,0 +1,116 @@
+import logging
+import pathlib
+import time
+
+import magic
+
+from modules.utils import database, executor, storage, uploads
+
+log = logging.getLogger(__name__)
+
+
+def relative(path: pathlib.Path) -> str:
+    """Path of a stored file relative to the uploads directory, as saved in the index."""
+    return path.relative_to(storage.ROOT).as_posix()
+
+
+def local_path(document: dict) -> pathlib.Path:
+    return storage.ROOT.joinpath(document["path"])
+
+
+def sniff(data: bytes) -> str:
+    """MIME type of a file from its first bytes."""
+    return magic.from_buffer(data[:2048], mime=True)
+
+
+async def record(
+    guild_id: int,
+    path: pathlib.Path,
+    size: int,
+    mime_type: str,
+    digest: str,
+    uploader: int | None,
+) -> None:
+    """Add or replace the index entry of a stored file."""
+    collection = database.Database().get_collection("uploads")
+    query = {"guild_id": guild_id, "path": relative(path)}
+    new_value = {
+        "$set": {
+            "directory": relative(path.parent),
+            "name": path.name,
+            "size": size,
+            "mime_type": mime_type,
+            "hash": digest,
+            "uploader": uploader,
+            "uploaded_on": time.time(),
+        }
+    }
+    await collection.update_one(query, new_value, upsert=True)
+
+
+async def get_files(guild_id: int, *directories: pathlib.Path) -> list[dict]:
+    """Index entries of the files directly in the given directories, sorted by path."""
+    collection = database.Database().get_collection("uploads")
+    query = {
+        "guild_id": guild_id,
+        "directory": {"$in": [relative(directory) for directory in directories]},
+    }
+    return await collection.find(query).sort("path").to_list()
+
+
+async def usage(guild_id: int) -> int:
+    """Bytes stored for a guild. Identical files are stored, and counted, once."""
+    collection = database.Database().get_collection("uploads")
+    pipeline = [
+        {"$match": {"guild_id": guild_id}},
+        {"$group": {"_id": "$hash", "size": {"$first": "$size"}}},
+        {"$group": {"_id": None, "total": {"$sum": "$size"}}},
+    ]
+    results = await collection.aggregate(pipeline).to_list()
+    return results[0]["total"] if results else 0
+
+
+def _scan() -> dict[str, pathlib.Path]:
+    """Every stored file on disk, skipping the blob store, bundles and temporary files."""
+    if not storage.ROOT.is_dir():
+        return {}
+
+    files = {}
+    for path in storage.ROOT.glob("*/**/*"):
+        parts = path.relative_to(storage.ROOT).parts
+        if not parts[0].isdigit() or any(part.startswith(".") for part in parts):
+            continue
+        if path.is_file():
+            files[relative(path)] = path
+    return files
+
+
+def _describe(path: pathlib.Path) -> tuple[int, str, str]:
+    size, _, digest = uploads.fingerprint(path)
+    with path.open(mode="rb") as file:
+        mime_type = sniff(file.read(2048))
+    return size, mime_type, digest
+
+
+async def backfill() -> None:
+    """Bring the index in line with the uploads directory.
+
+    Files stored before the index existed are added, and entries whose file is gone are
+    removed. Runs once as a migration, bump its version in setup_hook() to run it again,
+    e.g. after copying files in by hand.
+    """
+    collection = database.Database().get_collection("uploads")
+    on_disk = await executor.filesystem.run(_scan)
+    indexed = {result["path"] async for result in collection.find({}, {"path": 1})}
+
+    missing = [path for key, path in on_disk.items() if key not in indexed]
+    for path in missing:
+        size, mime_type, digest = await executor.filesystem.run(_describe, path)
+        guild_id = int(path.relative_to(storage.ROOT).parts[0])
+        await record(guild_id, path, size, mime_type, digest, uploader=None)
+
+    stale = [key for key in indexed if key not in on_disk]
+    if stale:
+        await collection.delete_many({"path": {"$in": stale}})
+
+    log.info(f"Upload index updated: {len(missing)} files added, {len(stale)} removed.")
@@ -0,0 +1,146 @@
+import bisect
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+import discord
+
+from modules.utils import database
+
+# Discord select menus hold at most 25 options.
+PAGE_SIZE = 25
+
+
+@dataclass
+class Page:
+    values: list[str]
+    has_previous: bool
+    has_next: bool
+
+
+class QuerySource:
+    """Sorted values of one field of the documents matching a query, read a page at a time.
+
+    Pages are fetched with keyset pagination: a range condition on the field next to the
+    first or last value shown, sorted and limited, so every page is a single indexed query
+    no matter how far the user has paged.
+    """
+
+    def __init__(
+        self, collection: str, query: Mapping[str, Any], field: str = "name"
+    ) -> None:
+        self.collection = collection
+        self.query = query
+        self.field = field
+
+    async def page(self, after: str = None, before: str = None) -> Page:
+        collection = database.Database().get_collection(self.collection)
+        query, direction = dict(self.query), 1
+        if after is not None:
+            query = {"$and": [self.query, {self.field: {"$gt": after}}]}
+        elif before is not None:
+            query = {"$and": [self.query, {self.field: {"$lt": before}}]}
+            direction = -1
+
+        # One extra document tells whether there is another page in that direction.
+        results = (
+            await collection.find(query, {self.field: 1})
+            .sort(self.field, direction)
+            .limit(PAGE_SIZE + 1)
+            .to_list()
+        )
+        values = [result[self.field] for result in results[:PAGE_SIZE]]
+        more = len(results) > PAGE_SIZE
+
+        if direction == -1:
+            return Page(values=values[::-1], has_previous=more, has_next=True)
+        return Page(values=values, has_previous=after is not None, has_next=more)
+
+
+class ListSource:
+    """Values that are already in memory, paged the same way as QuerySource."""
+
+    def __init__(self, values: list[str]) -> None:
+        self.values = sorted(values)
+
+    async def page(self, after: str = None, before: str = None) -> Page:
+        if before is not None:
+            end = bisect.bisect_left(self.values, before)
+            start = max(end - PAGE_SIZE, 0)
+        else:
+            start = 0 if after is None else bisect.bisect_right(self.values, after)
+            end = start + PAGE_SIZE
+
+        return Page(
+            values=self.values[start:end],
+            has_previous=start > 0,
+            has_next=end < len(self.values),
+        )
+
+
+class PaginatedSelect(discord.ui.Select):
+    """Select menu showing one page of a source, with buttons to move between pages.
+
+    Call `load()` to fetch the first page, then `add_to()` to add the menu to a view. The
+    page buttons are only added when there is more than one page. Views with several
+    menus should give each a `name`, which is added to the labels of its page buttons.
+    """
+
+    def __init__(
+        self, source: QuerySource | ListSource, name: str = None, **kwargs
+    ) -> None:
+        super().__init__(**kwargs)
+        self.source = source
+        self.name = name
+        self.page: Page | None = None
+        self.previous_button = PageButton(select=self, previous=True)
+        self.next_button = PageButton(select=self, previous=False)
+
+    async def load(self, after: str = None, before: str = None) -> bool:
+        """Show the page after or before a value, the first page by default.
+
+        Returns False if there is nothing to show.
+        """
+        page = await self.source.page(after=after, before=before)
+        # Values next to the cursor may have been removed since the last page was shown.
+        if not page.values and (after is not None or before is not None):
+            page = await self.source.page()
+
+        self.page = page
+        self.options = [discord.SelectOption(label=value) for value in page.values]
+        self.previous_button.disabled = not page.has_previous
+        self.next_button.disabled = not page.has_next
+        return bool(page.values)
+
+    def add_to(self, view: discord.ui.View, row: int = None) -> None:
+        """Add the menu, and its page buttons if needed, to a view.
+
+        With `row`, the menu goes in that row and its page buttons in the next one.
+        """
+        if row is not None:
+            self.row = row
+            self.previous_button.row = self.next_button.row = row + 1
+
+        view.add_item(self)
+        if self.page.has_previous or self.page.has_next:
+            view.add_item(self.previous_button)
+            view.add_item(self.next_button)
+
+
+class PageButton(discord.ui.Button):
+    def __init__(self, select: PaginatedSelect, previous: bool) -> None:
+        super().__init__()
+        self.select = select
+        self.previous = previous
+        self.label = "Previous" if previous else "Next"
+        if select.name:
+            self.label += f" {select.name}"
+        self.style = discord.ButtonStyle.gray
+        self.custom_id = f"{select.custom_id}_{'previous' if previous else 'next'}"
+
+    async def callback(self, interaction: discord.Interaction) -> None:
+        values = self.select.page.values
+        if self.previous:
+            await self.select.load(before=values[0] if values else None)
+        else:
+            await self.select.load(after=values[-1] if values else None)
+        await interaction.response.edit_message(view=self.view)
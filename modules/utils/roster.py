@@ -0,0 +1,268 @@
+import csv
+import io
+import logging
+import random
+from dataclasses import dataclass, field
+from typing import Iterable
+
+import discord
+from pymongo.errors import BulkWriteError
+
+from modules.utils import database, membership
+
+log = logging.getLogger(__name__)
+
+# Rosters are small text files, anything bigger is not a roster.
+MAX_ROSTER_SIZE = 1 << 20
+# Discord limits a guild to 500 channels, categories included, and names to 100
+# characters. Every team takes a category, a text channel and a voice channel.
+MAX_CHANNELS = 500
+MAX_NAME_LENGTH = 100
+CHANNELS_PER_TEAM = 3
+
+
+class RosterError(Exception):
+    """A roster was rejected. The message is meant to be shown to the user."""
+
+
+@dataclass
+class PlannedTeam:
+    name: str
+    members: list[discord.Member] = field(default_factory=list)
+    section: str | None = None
+
+
+def parse(
+    guild: discord.Guild,
+    data: bytes,
+    team_size: int,
+    existing: set[str],
+    assigned: set[int],
+) -> list[PlannedTeam]:
+    """Teams of a CSV roster with a `team` and a `member` column, one row per student.
+
+    Members are user ids or usernames. An optional `section` column sets the section of
+    the team, used to distribute peer reviews within sections. Raises RosterError if the
+    roster is malformed, names a team in `existing`, lists a member in `assigned` to a
+    team already, or does not fit `team_size`.
+    """
+    try:
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8-sig")))
+        rows = list(reader)
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise RosterError(f"The roster is not a valid CSV file: {error}")
+
+    columns = {column.strip().lower() for column in reader.fieldnames or []}
+    if not {"team", "member"} <= columns:
+        raise RosterError("The roster must have a `team` and a `member` column.")
+
+    teams: dict[str, PlannedTeam] = {}
+    seen: set[int] = set()
+    for line, row in enumerate(rows, start=2):
+        # DictReader puts the fields past the header under a None key.
+        if None in row:
+            raise RosterError(f"Line {line} has more fields than the header.")
+
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items()}
+        name, member_name = row["team"], row["member"]
+        if not name or not member_name:
+            raise RosterError(f"Line {line} is missing a team or a member.")
+
+        member = (
+            guild.get_member(int(member_name))
+            if member_name.isdigit()
+            else guild.get_member_named(member_name)
+        )
+        if member is None:
+            raise RosterError(f"Line {line}: '{member_name}' is not in this server.")
+        if member.id in seen:
+            raise RosterError(f"Line {line}: '{member_name}' is listed twice.")
+        if member.id in assigned:
+            raise RosterError(f"Line {line}: '{member_name}' is already in a team.")
+        seen.add(member.id)
+
+        team = teams.setdefault(name, PlannedTeam(name=name))
+        team.members.append(member)
+        team.section = row.get("section") or team.section
+
+    taken = sorted(name for name in teams if name in existing)
+    if taken:
+        raise RosterError(f"These teams already exist: {', '.join(taken)}.")
+
+    oversized = sorted(
+        name for name, team in teams.items() if len(team.members) > team_size
+    )
+    if oversized:
+        raise RosterError(
+            f"These teams have more than {team_size} members: {', '.join(oversized)}."
+        )
+
+    return list(teams.values())
+
+
+async def get_taken(guild_id: int) -> tuple[set[str], set[int]]:
+    """Names of the existing teams and ids of the users already in a team."""
+    collection = database.Database().get_collection("teams")
+    query = {"guild_id": guild_id}
+    results = await collection.find(query, {"name": 1, "members": 1}).to_list()
+    names = {result["name"] for result in results}
+    members = {member for result in results for member in result["members"]}
+    return names, members
+
+
+def exclude(
+    teams: list[PlannedTeam], existing: set[str], assigned: set[int]
+) -> tuple[list[PlannedTeam], int]:
+    """Drop the teams named in `existing` and the members in `assigned`.
+
+    Team names and memberships may have changed since a roster was previewed. Returns
+    the remaining teams that still have members and the number of members dropped.
+    """
+    kept = []
+    dropped = 0
+    for team in teams:
+        if team.name in existing:
+            continue
+        members = [member for member in team.members if member.id not in assigned]
+        dropped += len(team.members) - len(members)
+        if members:
+            kept.append(
+                PlannedTeam(name=team.name, members=members, section=team.section)
+            )
+    return kept, dropped
+
+
+def validate(guild: discord.Guild, teams: list[PlannedTeam]) -> None:
+    """Raise RosterError if the channels of the teams cannot be created in the guild."""
+    needed = len(teams) * CHANNELS_PER_TEAM
+    if len(guild.channels) + needed > MAX_CHANNELS:
+        raise RosterError(
+            f"Creating {len(teams)} teams needs {needed} channels, but this server only "
+            f"has room for {max(MAX_CHANNELS - len(guild.channels), 0)} more."
+        )
+
+    invalid = sorted(team.name for team in teams if len(team.name) > MAX_NAME_LENGTH)
+    if invalid:
+        raise RosterError(
+            f"These team names are longer than {MAX_NAME_LENGTH} characters: "
+            f"{', '.join(invalid)}."
+        )
+
+
+def preview(teams: list[PlannedTeam]) -> str:
+    """Numbered list of teams and their members, cut short to fit in an embed."""
+    string = ""
+    for index, team in enumerate(teams):
+        members = ", ".join(member.mention for member in team.members)
+        line = f"{index + 1}. {team.name}: {members}\n"
+        if len(string) + len(line) > 3000:
+            string += f"...and {len(teams) - index} more teams.\n"
+            break
+        string += line
+    return string
+
+
+def partition(
+    members: list[discord.Member], team_size: int, existing: set[str], seed: int = None
+) -> list[PlannedTeam]:
+    """Shuffle members into as few teams as possible, sizes differing by at most one."""
+    members = sorted(members, key=lambda member: member.id)
+    random.Random(seed).shuffle(members)
+    count = -(-len(members) // team_size)
+
+    names = []
+    number = 1
+    while len(names) < count:
+        name = f"Team {number}"
+        if name not in existing:
+            names.append(name)
+        number += 1
+
+    return [
+        PlannedTeam(name=name, members=members[index::count])
+        for index, name in enumerate(names)
+    ]
+
+
+async def create(
+    guild: discord.Guild,
+    teams: list[PlannedTeam],
+    instructor_role: discord.Role,
+    bot_user: discord.ClientUser,
+) -> int:
+    """Create the channels of every team, then insert all teams with one bulk write.
+
+    Returns the number of teams created. Teams whose name was taken in the meantime are
+    skipped and their channels removed. If Discord rejects a channel, every channel
+    created so far is removed and RosterError is raised.
+    """
+    documents = []
+    channels = {}
+    try:
+        for team in teams:
+            permission = {
+                guild.default_role: discord.PermissionOverwrite(read_messages=False),
+                instructor_role: discord.PermissionOverwrite(read_messages=True),
+                bot_user: discord.PermissionOverwrite(read_messages=True),
+            }
+            for member in team.members:
+                permission[member] = discord.PermissionOverwrite(read_messages=True)
+
+            created = channels.setdefault(team.name, [])
+            category = await guild.create_category(
+                name=team.name, overwrites=permission
+            )
+            created.append(category)
+            channel = await guild.create_text_channel(name=team.name, category=category)
+            created.append(channel)
+            voice_channel = await guild.create_voice_channel(
+                name=team.name, category=category, bitrate=96000
+            )
+            created.append(voice_channel)
+
+            document = {
+                "guild_id": guild.id,
+                "channel_id": channel.id,
+                "voice_channel_id": voice_channel.id,
+                "name": team.name,
+                "members": [member.id for member in team.members],
+            }
+            if team.section:
+                document["section"] = team.section
+            documents.append(document)
+    except discord.HTTPException as error:
+        log.warning(f"Unable to create the channels of team {team.name}: {error}")
+        await _delete(channel for created in channels.values() for channel in created)
+        raise RosterError(
+            f"Discord refused to create the channels of {team.name}: {error.text}. "
+            "No teams were created."
+        )
+
+    collection = database.Database().get_collection("teams")
+    failed = set()
+    try:
+        await collection.insert_many(documents, ordered=False)
+    except BulkWriteError as error:
+        failed = {
+            documents[item["index"]]["name"] for item in error.details["writeErrors"]
+        }
+        log.warning(f"Unable to import {len(failed)} teams in guild {guild.id}.")
+
+    for team in teams:
+        if team.name in failed:
+            await _delete(channels[team.name])
+            continue
+
+        for member in team.members:
+            membership.index.add(guild_id=guild.id, user_id=member.id, team=team.name)
+
+    return len(teams) - len(failed)
+
+
+async def _delete(channels: Iterable[discord.abc.GuildChannel]) -> None:
+    """Delete channels, children before their category, ignoring ones already gone."""
+    for channel in reversed(list(channels)):
+        try:
+            await channel.delete()
+        except discord.HTTPException as error:
+            log.warning(f"Unable to delete channel {channel.id}: {error}")
@@ -0,0 +1,192 @@
+import logging
+import time
+from typing import Awaitable, Callable
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure, PyMongoError
+
+from modules.utils import database
+
+log = logging.getLogger(__name__)
+
+# Every query on the interactive path filters by guild first, so each index leads with guild_id.
+# Indexes are matched against the database by their key pattern, not by name.
+INDEXES = {
+    "settings": [
+        IndexModel([("guild_id", ASCENDING)], name="guild_id", unique=True),
+    ],
+    "courses": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("user_id", ASCENDING)], name="guild_id_user_id"
+        ),
+    ],
+    "teams": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("name", ASCENDING)],
+            name="guild_id_name",
+            unique=True,
+        ),
+        # Multikey index, one entry per member. Unique so that nobody is in two teams,
+        # teams without members are left out as they would all share the same key.
+        IndexModel(
+            [("guild_id", ASCENDING), ("members", ASCENDING)],
+            name="guild_id_members",
+            unique=True,
+            partialFilterExpression={"members.0": {"$exists": True}},
+        ),
+    ],
+    "assignments": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("name", ASCENDING)],
+            name="guild_id_name",
+            unique=True,
+        ),
+    ],
+    "cooldown": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("command", ASCENDING)],
+            name="guild_id_command",
+            unique=True,
+        ),
+    ],
+    "tasks": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("user_id", ASCENDING), ("command", ASCENDING)],
+            name="guild_id_user_id_command",
+            unique=True,
+        ),
+        # TTL index, MongoDB deletes a task once its cooldown is over.
+        IndexModel(
+            [("expires_on", ASCENDING)], name="expires_on", expireAfterSeconds=0
+        ),
+    ],
+    "uploads": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("path", ASCENDING)],
+            name="guild_id_path",
+            unique=True,
+        ),
+        IndexModel(
+            [("guild_id", ASCENDING), ("directory", ASCENDING)],
+            name="guild_id_directory",
+        ),
+        IndexModel(
+            [("guild_id", ASCENDING), ("hash", ASCENDING)], name="guild_id_hash"
+        ),
+    ],
+    "distributions": [
+        # The current distribution of an assignment is the one with the highest version.
+        IndexModel(
+            [
+                ("guild_id", ASCENDING),
+                ("assignment", ASCENDING),
+                ("version", DESCENDING),
+            ],
+            name="guild_id_assignment_version",
+            unique=True,
+        ),
+        # Multikey index, one entry per reviewer, for renaming and removing teams.
+        IndexModel(
+            [("guild_id", ASCENDING), ("reviews.reviewer", ASCENDING)],
+            name="guild_id_reviews_reviewer",
+        ),
+    ],
+    "grades": [
+        IndexModel(
+            [
+                ("guild_id", ASCENDING),
+                ("assignment", ASCENDING),
+                ("team", ASCENDING),
+                ("reviewer", ASCENDING),
+            ],
+            name="guild_id_assignment_team_reviewer",
+            unique=True,
+        ),
+    ],
+    "scores": [
+        IndexModel(
+            [("guild_id", ASCENDING), ("assignment", ASCENDING)],
+            name="guild_id_assignment",
+            unique=True,
+        ),
+    ],
+}
+
+
+def _options(index: dict) -> dict:
+    """Options of an index that matter when comparing two indexes with the same key."""
+    return {
+        key: value
+        for key, value in index.items()
+        if key not in ("key", "name", "v", "ns", "background")
+    }
+
+
+async def ensure_indexes() -> None:
+    """Create missing indexes and report the ones that conflict with the expected schema.
+
+    Conflicting indexes are never dropped automatically because that could require
+    cleaning up duplicated documents first.
+    """
+    created = 0
+    conflicts = 0
+    for name, models in INDEXES.items():
+        collection = database.Database().get_collection(name)
+        try:
+            existing = await collection.index_information()
+        except PyMongoError as error:
+            log.error(f"Unable to read indexes of '{name}': {error}")
+            continue
+
+        existing_by_key = {
+            tuple(tuple(field) for field in value["key"]): value
+            for value in existing.values()
+        }
+
+        for model in models:
+            document = model.document
+            key = tuple(document["key"].items())
+            current = existing_by_key.get(key)
+
+            if current is not None:
+                if _options(current) != _options(document):
+                    conflicts += 1
+                    log.warning(
+                        f"Index {dict(key)} on '{name}' has options {_options(current)}, "
+                        f"expected {_options(document)}."
+                    )
+                continue
+
+            try:
+                await collection.create_indexes([model])
+            except OperationFailure as error:
+                conflicts += 1
+                log.warning(
+                    f"Unable to create index '{document['name']}' on '{name}': {error}"
+                )
+                continue
+
+            created += 1
+            log.info(f"Created index '{document['name']}' on '{name}'.")
+
+    log.info(f"Index check finished: {created} created, {conflicts} conflicting.")
+
+
+async def migrate(
+    name: str, version: int, function: Callable[[], Awaitable[None]]
+) -> None:
+    """Run a one-time migration unless this version of it already ran.
+
+    Applied versions are stored in the `migrations` collection, one document per
+    migration, so a restart does not scan the migrated collections again. A migration
+    that raises is not recorded and runs again on the next start.
+    """
+    collection = database.Database().get_collection("migrations")
+    result = await collection.find_one({"_id": name})
+    if result is not None and result["version"] >= version:
+        return
+
+    await function()
+    new_value = {"$set": {"version": version, "migrated_on": time.time()}}
+    await collection.update_one({"_id": name}, new_value, upsert=True)
+    log.info(f"Applied migration '{name}' version {version}.")
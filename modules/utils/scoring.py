@@ -0,0 +1,417 @@
+import asyncio
+import logging
+import math
+import time
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+import numpy as np
+
+from modules.utils import cache, database, executor
+
+log = logging.getLogger(__name__)
+
+ITERATIONS = 10
+# Reviews a reviewer's bias is shrunk towards, so one review cannot set a large bias.
+BIAS_PRIOR = 2.0
+# Reviews a reviewer's variance is shrunk towards the pooled variance.
+VARIANCE_PRIOR = 4.0
+# Reviews further than this many robust standard deviations from the consensus are
+# ignored, with a floor on the spread so that unanimous grades do not flag everything.
+OUTLIER_THRESHOLD = 3.0
+MIN_SPREAD = 0.05
+# With fewer reviews there is no clear majority to tell which review is the outlier,
+# and dropping one of three reviews loses more than the outliers it catches.
+MIN_OUTLIER_REVIEWS = 4
+EPSILON = 1e-3
+# Seconds a matrix is kept after its assignment was last scored. Grading happens in
+# bursts, so this keeps the matrices of assignments being graded right now only.
+MATRIX_TTL = 1800
+
+
+@dataclass
+class Calibration:
+    """Result of calibrate(), all in fractions of the maximum points."""
+
+    scores: np.ndarray
+    bias: np.ndarray
+    weights: np.ndarray
+    # One flag per review, in the order of the reviews passed to calibrate().
+    outliers: np.ndarray
+
+
+def _medians(rows: np.ndarray, values: np.ndarray, teams: int) -> np.ndarray:
+    """Median value of each row, NaN for rows without any value."""
+    order = np.lexsort((values, rows))
+    rows, values = rows[order], values[order]
+    counts = np.bincount(rows, minlength=teams)
+    starts = np.cumsum(counts) - counts
+    graded = counts > 0
+    low = starts[graded] + (counts[graded] - 1) // 2
+    high = starts[graded] + counts[graded] // 2
+    medians = np.full(teams, np.nan)
+    medians[graded] = (values[low] + values[high]) / 2
+    return medians
+
+
+def calibrate(
+    rows: np.ndarray,
+    columns: np.ndarray,
+    values: np.ndarray,
+    anchors: np.ndarray,
+    reviewers: int,
+) -> Calibration:
+    """Calibrated team scores from a list of peer reviews.
+
+    Review `i` is reviewer `columns[i]`'s grade of team `rows[i]` as a fraction of the
+    maximum points, NaN if unknown. `anchors` holds the instructor grade of each team,
+    NaN where there is none; anchored teams keep that score and serve as ground truth
+    for the reviewers who graded them.
+
+    Starting from the median grade of each team, every iteration estimates the bias of
+    each reviewer as their mean deviation from the current scores (shrunk towards zero),
+    weights reviewers by the inverse variance of their bias-corrected grades (shrunk
+    towards the pooled variance), flags reviews more than OUTLIER_THRESHOLD robust
+    deviations away on teams with enough reviews, and recomputes scores as the weighted
+    mean of the remaining bias-corrected grades. Every step is a vectorized operation over the reviews, with per-team and
+    per-reviewer sums done by np.bincount, so the cost grows with the number of reviews
+    rather than with teams x reviewers.
+    """
+    teams = len(anchors)
+    observed = ~np.isnan(values)
+    values = np.where(observed, values, 0.0)
+    anchored = ~np.isnan(anchors)
+    reviews = np.bincount(rows[observed], minlength=teams)
+    checked = (reviews >= MIN_OUTLIER_REVIEWS)[rows]
+
+    median = _medians(rows[observed], values[observed], teams)
+    scores = np.where(anchored, anchors, median)
+
+    mask = observed
+    bias = np.zeros(reviewers)
+    weights = np.ones(reviewers)
+    for _ in range(ITERATIONS):
+        known = mask & ~np.isnan(scores)[rows]
+        residual = np.where(known, values - np.nan_to_num(scores)[rows], 0.0)
+        counts = np.bincount(columns, weights=known.astype(float), minlength=reviewers)
+        bias = np.bincount(columns, weights=residual, minlength=reviewers) / (
+            counts + BIAS_PRIOR
+        )
+
+        adjusted = values - bias[columns]
+        error = np.where(known, residual - bias[columns], 0.0)
+        # Two or three reviews say little about a reviewer's variance, so it is shrunk
+        # towards the variance pooled over all reviewers like the bias is shrunk towards
+        # zero. Reviewers without retained reviews get the pooled variance.
+        squares = np.bincount(columns, weights=error**2, minlength=reviewers)
+        pooled = squares.sum() / counts.sum() if counts.sum() else 0.0
+        variance = (squares + VARIANCE_PRIOR * pooled) / (counts + VARIANCE_PRIOR)
+        weights = 1.0 / (variance + EPSILON)
+
+        # Median absolute deviation scaled to a standard deviation under normality.
+        deviation = np.abs(adjusted - np.nan_to_num(scores)[rows])
+        comparable = observed & checked & ~np.isnan(scores)[rows]
+        spread = 1.4826 * np.median(deviation[comparable]) if comparable.any() else 0.0
+        mask = observed & (
+            ~comparable | (deviation <= OUTLIER_THRESHOLD * max(spread, MIN_SPREAD))
+        )
+
+        weighted = np.where(mask, weights[columns], 0.0)
+        total = np.bincount(rows, weights=weighted, minlength=teams)
+        estimate = np.divide(
+            np.bincount(rows, weights=weighted * adjusted, minlength=teams),
+            total,
+            out=np.full(teams, np.nan),
+            where=total > 0,
+        )
+        scores = np.where(anchored, anchors, np.clip(estimate, 0.0, 1.0))
+
+    return Calibration(
+        scores=scores, bias=bias, weights=weights, outliers=observed & ~mask
+    )
+
+
+class GradeMatrix:
+    """Grades of one assignment, kept sparse.
+
+    Every team is only reviewed by a few others, so a teams x reviewers matrix would be
+    almost entirely empty. Peer reviews are parallel arrays of team row, reviewer column
+    and value instead, next to the instructor grade of each team.
+    """
+
+    def __init__(
+        self, max_points: float, teams: list[str], reviewers: list[str]
+    ) -> None:
+        self.max_points = max_points
+        self.teams = {team: row for row, team in enumerate(teams)}
+        self.reviewers = {reviewer: column for column, reviewer in enumerate(reviewers)}
+        self.rows = np.zeros(0, np.intp)
+        self.columns = np.zeros(0, np.intp)
+        self.values = np.zeros(0)
+        self.anchors = np.full(len(teams), np.nan)
+        # Position of each (row, column) review in the arrays.
+        self.cells: dict[tuple[int, int], int] = {}
+
+    @classmethod
+    def from_grades(
+        cls, max_points: float, grades: list[Mapping[str, Any]]
+    ) -> "GradeMatrix":
+        """Matrix of grade documents, built with vectorized operations."""
+        peer = np.array([grade.get("reviewer") is not None for grade in grades], bool)
+        legacy = np.array([grade.get("legacy", False) for grade in grades], bool)
+        teams, rows = np.unique(
+            np.array([grade["team"] for grade in grades], object), return_inverse=True
+        )
+        reviewers, columns = np.unique(
+            np.array([grade["reviewer"] for grade in grades], object)[peer],
+            return_inverse=True,
+        )
+        points = np.array([grade["points"] for grade in grades], float)
+        values = points / max_points if max_points else np.full(len(points), np.nan)
+
+        matrix = cls(max_points, teams.tolist(), reviewers.tolist())
+        matrix.rows = rows[peer].astype(np.intp)
+        matrix.columns = columns.astype(np.intp)
+        matrix.values = values[peer]
+        anchored = ~peer & ~legacy
+        matrix.anchors[rows[anchored]] = values[anchored]
+        matrix.cells = {
+            cell: position
+            for position, cell in enumerate(
+                zip(matrix.rows.tolist(), matrix.columns.tolist())
+            )
+        }
+        return matrix
+
+    def _row(self, team: str) -> int:
+        if team not in self.teams:
+            self.teams[team] = len(self.teams)
+            self.anchors = np.append(self.anchors, np.nan)
+        return self.teams[team]
+
+    def _column(self, reviewer: str) -> int:
+        return self.reviewers.setdefault(reviewer, len(self.reviewers))
+
+    def set(self, team: str, reviewer: str | None, points: float) -> None:
+        """Change one grade. A new review copies the review arrays once to grow them."""
+        value = points / self.max_points if self.max_points else np.nan
+        row = self._row(team)
+        if reviewer is None:
+            self.anchors[row] = value
+            return
+
+        cell = (row, self._column(reviewer))
+        position = self.cells.get(cell)
+        if position is None:
+            self.cells[cell] = len(self.values)
+            self.rows = np.append(self.rows, cell[0])
+            self.columns = np.append(self.columns, cell[1])
+            self.values = np.append(self.values, value)
+        else:
+            self.values[position] = value
+
+    def update(self, changes: dict[tuple[str, str | None], float]) -> None:
+        for (team, reviewer), points in changes.items():
+            self.set(team, reviewer, points)
+
+    def rename(self, name: str, new_name: str) -> None:
+        for names in (self.teams, self.reviewers):
+            if name in names:
+                names[new_name] = names.pop(name)
+
+
+def _summarize(matrix: GradeMatrix) -> tuple[list[dict], list[dict]]:
+    """Calibrate a matrix and turn the result into the team and reviewer entries of its
+    scores document, in points.
+    """
+    calibration = calibrate(
+        matrix.rows,
+        matrix.columns,
+        matrix.values,
+        matrix.anchors,
+        len(matrix.reviewers),
+    )
+    teams = [""] * len(matrix.teams)
+    for team, row in matrix.teams.items():
+        teams[row] = team
+    reviewers = [""] * len(matrix.reviewers)
+    for reviewer, column in matrix.reviewers.items():
+        reviewers[column] = reviewer
+
+    outliers = [[] for _ in teams]
+    for position in np.flatnonzero(calibration.outliers).tolist():
+        outliers[matrix.rows[position]].append(reviewers[matrix.columns[position]])
+    scores = (calibration.scores * matrix.max_points).tolist()
+    reviews = np.bincount(
+        matrix.rows[~np.isnan(matrix.values)], minlength=len(teams)
+    ).tolist()
+    bias = (calibration.bias * matrix.max_points).tolist()
+
+    return [
+        {
+            "team": team,
+            "score": None if math.isnan(scores[row]) else scores[row],
+            "reviews": reviews[row],
+            "outliers": outliers[row],
+        }
+        for row, team in enumerate(teams)
+    ], [
+        {"reviewer": reviewer, "bias": bias[column], "weight": weight}
+        for column, (reviewer, weight) in enumerate(
+            zip(reviewers, calibration.weights.tolist())
+        )
+    ]
+
+
+class ScoringEngine:
+    """Keeps the grade matrix of each assignment in memory and the `scores` collection in
+    line with it.
+
+    Scoring runs in the background, in one task per assignment, so saving a grade never
+    waits for it. Grades changed while an assignment is being scored are collected and
+    applied together before the next calibration. A matrix is loaded from the grades
+    collection the first time an assignment is scored, after that a changed grade only
+    updates one review until the matrix expires. Building matrices and calibrating them
+    runs on the compute pool.
+    """
+
+    def __init__(self) -> None:
+        self.matrices = cache.TTLCache(ttl=MATRIX_TTL)
+        # Only the task of an assignment touches its matrix while it runs.
+        self._tasks: dict[tuple[int, str], asyncio.Task] = {}
+        self._changes: dict[tuple[int, str], dict[tuple[str, str | None], float]] = {}
+        self._reloads: set[tuple[int, str]] = set()
+
+    async def _load(self, guild_id: int, assignment: str) -> GradeMatrix | None:
+        assignment_collection = database.Database().get_collection("assignments")
+        assignment_query = {"guild_id": guild_id, "name": assignment}
+        assignment_result = await assignment_collection.find_one(assignment_query)
+        if assignment_result is None:
+            return None
+
+        grade_collection = database.Database().get_collection("grades")
+        grade_query = {"guild_id": guild_id, "assignment": assignment}
+        projection = {"_id": 0, "team": 1, "reviewer": 1, "points": 1, "legacy": 1}
+        grade_results = await grade_collection.find(grade_query, projection).to_list()
+        return await executor.compute.run(
+            GradeMatrix.from_grades, assignment_result["points"], grade_results
+        )
+
+    async def _save(self, guild_id: int, assignment: str, matrix: GradeMatrix) -> None:
+        teams, reviewers = await executor.compute.run(_summarize, matrix)
+        collection = database.Database().get_collection("scores")
+        query = {"guild_id": guild_id, "assignment": assignment}
+        new_value = {
+            "$set": {"teams": teams, "reviewers": reviewers, "updated_on": time.time()}
+        }
+        await collection.update_one(query, new_value, upsert=True)
+
+    async def _score(
+        self,
+        key: tuple[int, str],
+        reload: bool,
+        changes: dict[tuple[str, str | None], float],
+    ) -> None:
+        matrix = None if reload else self.matrices.get(key)
+        if matrix is None:
+            # Grades are saved before they are queued, so a fresh load contains them.
+            matrix = await self._load(*key)
+            if matrix is None:
+                self.matrices.invalidate(key)
+                return
+        elif changes:
+            await executor.compute.run(matrix.update, changes)
+
+        await self._save(*key, matrix)
+        self.matrices.set(key, matrix)
+        self.matrices.prune()
+
+    async def _run(self, key: tuple[int, str]) -> None:
+        try:
+            while key in self._changes or key in self._reloads:
+                reload = key in self._reloads
+                self._reloads.discard(key)
+                changes = self._changes.pop(key, {})
+                try:
+                    await self._score(key, reload, changes)
+                except Exception:
+                    log.exception(f"Unable to score '{key[1]}' in guild {key[0]}.")
+                    # Start over from the grades collection with the next change.
+                    self.matrices.invalidate(key)
+        finally:
+            self._tasks.pop(key, None)
+
+    def _schedule(self, key: tuple[int, str]) -> None:
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run(key))
+
+    def update(
+        self,
+        guild_id: int,
+        assignment: str,
+        team: str,
+        reviewer: str | None,
+        points: float,
+    ) -> None:
+        """Queue a saved grade change, the assignment is scored again in the background."""
+        key = (guild_id, assignment)
+        self._changes.setdefault(key, {})[(team, reviewer)] = points
+        self._schedule(key)
+
+    def recompute(self, guild_id: int, assignment: str) -> None:
+        """Queue reloading an assignment from the grades collection and scoring it again,
+        for changes such as new maximum points that affect every grade at once.
+        """
+        key = (guild_id, assignment)
+        self._reloads.add(key)
+        self._changes.pop(key, None)
+        self._schedule(key)
+
+    async def rename_team(self, guild_id: int, name: str, new_name: str) -> None:
+        """Rename a team in the loaded matrices and the stored scores.
+
+        Calibration does not depend on names, so idle assignments are not scored again.
+        Assignments being scored right now are reloaded once they are done instead, as
+        their scores may still be saved under the old name.
+        """
+        for key, matrix in self.matrices.items():
+            if key[0] == guild_id and key not in self._tasks:
+                matrix.rename(name, new_name)
+        for key in self._tasks:
+            if key[0] == guild_id:
+                self._reloads.add(key)
+
+        collection = database.Database().get_collection("scores")
+        await collection.update_many(
+            {"guild_id": guild_id, "teams.team": name},
+            {"$set": {"teams.$[team].team": new_name}},
+            array_filters=[{"team.team": name}],
+        )
+        await collection.update_many(
+            {"guild_id": guild_id, "teams.outliers": name},
+            {"$set": {"teams.$[].outliers.$[outlier]": new_name}},
+            array_filters=[{"outlier": name}],
+        )
+        await collection.update_many(
+            {"guild_id": guild_id, "reviewers.reviewer": name},
+            {"$set": {"reviewers.$[reviewer].reviewer": new_name}},
+            array_filters=[{"reviewer.reviewer": name}],
+        )
+
+    def remove_team(self, guild_id: int, assignments: list[str]) -> None:
+        """Queue reloading the assignments a removed team had grades in, so that their
+        matrices and stored scores no longer contain it.
+        """
+        for assignment in assignments:
+            self.recompute(guild_id, assignment)
+
+
+async def get_score(guild_id: int, assignment: str, team: str) -> dict | None:
+    """Calibrated score entry of a team, None if the assignment was not scored yet."""
+    collection = database.Database().get_collection("scores")
+    query = {"guild_id": guild_id, "assignment": assignment, "teams.team": team}
+    result = await collection.find_one(query, {"teams": {"$elemMatch": {"team": team}}})
+    return result["teams"][0] if result else None
+
+
+engine = ScoringEngine()
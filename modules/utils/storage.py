@@ -0,0 +1,163 @@
+import hashlib
+import hmac
+import logging
+import os
+import pathlib
+import secrets
+import time
+import urllib.parse
+from typing import Awaitable, Callable
+
+import confuse
+from aiohttp import web
+
+from modules.utils import uploads
+from modules.utils.config import config
+
+log = logging.getLogger(__name__)
+
+ROOT = pathlib.Path(__file__).parents[2].joinpath("uploads")
+
+
+def hyperlinks(links: list[str | None], done: bool = True) -> list[str]:
+    """Markdown download links, with a placeholder for links that are pending or failed."""
+    placeholder = "*Upload failed*" if done else "*Uploading...*"
+    return [f"[Download]({link})" if link else placeholder for link in links]
+
+
+def _expanded(view: confuse.ConfigView) -> str:
+    """Option with environment variables expanded, empty if a variable is not set."""
+    value = view.get(confuse.String(default="")) or ""
+    value = os.path.expandvars(value)
+    return "" if "${" in value else value
+
+
+class Backend:
+    """How files stored under the uploads directory are delivered to users."""
+
+    async def start(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def get_links(
+        self,
+        paths: list[pathlib.Path],
+        on_update: Callable[[list[str | None]], Awaitable[None]] = None,
+        mime_types: list[str] = None,
+    ) -> list[str | None]:
+        """Download links for files, in the same order as `paths`. None if a file is unavailable.
+
+        `on_update` may be called with partial results while the links are being made.
+        `mime_types`, if known, are the MIME types of the files in the same order.
+        """
+        raise NotImplementedError
+
+
+class LitterboxBackend(Backend):
+    """Uploads files to litterbox and links to the copies there."""
+
+    async def get_links(
+        self,
+        paths: list[pathlib.Path],
+        on_update: Callable[[list[str | None]], Awaitable[None]] = None,
+        mime_types: list[str] = None,
+    ) -> list[str | None]:
+        return await uploads.get_links(
+            paths, on_update=on_update, mime_types=mime_types
+        )
+
+
+class LocalBackend(Backend):
+    """Serves files straight from the uploads directory with an embedded HTTP server.
+
+    Links are signed with HMAC and expire after `link_ttl` seconds. Range requests and
+    sendfile are handled by aiohttp's FileResponse.
+    """
+
+    def __init__(self) -> None:
+        options = config["storage"]
+        self.host = options["host"].get(confuse.String(default="0.0.0.0"))
+        self.port = options["port"].get(confuse.Integer(default=8080))
+        self.link_ttl = options["link_ttl"].get(confuse.Integer(default=3600))
+        # Links point at this URL, the address the server listens on is rarely reachable.
+        self.public_url = _expanded(options["public_url"]).rstrip("/")
+        if not self.public_url:
+            log.error(
+                "The local storage backend needs storage.public_url (STORAGE_PUBLIC_URL)."
+            )
+            raise SystemExit
+
+        secret = _expanded(options["secret"])
+        if not secret:
+            log.warning(
+                "No storage secret configured, download links will not survive a restart."
+            )
+            secret = secrets.token_hex(32)
+        self.secret = secret.encode()
+
+        self._runner: web.AppRunner | None = None
+
+    def _sign(self, relative: str, expires: int) -> str:
+        message = f"{relative}:{expires}".encode()
+        return hmac.new(self.secret, message, hashlib.sha256).hexdigest()
+
+    def url(self, path: pathlib.Path) -> str:
+        """Signed, expiring download link for a file under the uploads directory."""
+        relative = path.relative_to(ROOT).as_posix()
+        expires = int(time.time()) + self.link_ttl
+        query = urllib.parse.urlencode(
+            {"expires": expires, "signature": self._sign(relative, expires)}
+        )
+        return f"{self.public_url}/files/{urllib.parse.quote(relative)}?{query}"
+
+    async def get_links(
+        self,
+        paths: list[pathlib.Path],
+        on_update: Callable[[list[str | None]], Awaitable[None]] = None,
+        mime_types: list[str] = None,
+    ) -> list[str | None]:
+        return [self.url(path) for path in paths]
+
+    async def _handle(self, request: web.Request) -> web.FileResponse:
+        relative = request.match_info["path"]
+        try:
+            expires = int(request.query["expires"])
+            signature = request.query["signature"]
+        except (KeyError, ValueError):
+            raise web.HTTPForbidden()
+
+        if expires < time.time() or not hmac.compare_digest(
+            signature, self._sign(relative, expires)
+        ):
+            raise web.HTTPForbidden()
+
+        path = ROOT.joinpath(relative).resolve()
+        if not path.is_relative_to(ROOT.resolve()) or not path.is_file():
+            raise web.HTTPNotFound()
+
+        disposition = f"attachment; filename*=UTF-8''{urllib.parse.quote(path.name)}"
+        return web.FileResponse(path, headers={"Content-Disposition": disposition})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_get("/files/{path:.+}", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        log.info(f"Serving uploads on {self.host}:{self.port} as {self.public_url}")
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+BACKENDS = {"litterbox": LitterboxBackend, "local": LocalBackend}
+
+backend: Backend = BACKENDS[
+    config["storage"]["backend"].get(
+        confuse.Choice(list(BACKENDS), default="litterbox")
+    )
+]()
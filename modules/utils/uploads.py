@@ -0,0 +1,195 @@
+import asyncio
+import hashlib
+import logging
+import pathlib
+import time
+import urllib.parse
+from typing import AsyncIterator, Awaitable, Callable
+
+import aiohttp
+import confuse
+
+from modules.utils import executor
+from modules.utils.config import config
+
+log = logging.getLogger(__name__)
+
+LITTERBOX_URL = "https://litterbox.catbox.moe/resources/internals/api.php"
+# Litterbox links expire after an hour. A cached link is only handed out if it is still
+# valid for at least LINK_MARGIN seconds, so that whoever receives it has time to use it.
+LINK_TIME = "1h"
+LINK_LIFETIME = 3600
+LINK_MARGIN = 600
+
+
+# Path -> (size, mtime, sha256), to avoid hashing unchanged files again.
+_fingerprints: dict[pathlib.Path, tuple[int, int, str]] = {}
+
+
+def fingerprint(path: pathlib.Path) -> tuple[int, int, str]:
+    """(size, mtime, sha256) of a file. Blocking, run it in a thread.
+
+    The hash is only recomputed when the size or mtime of the file changed.
+    """
+    stat = path.stat()
+    known = _fingerprints.get(path)
+    if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+        return known
+
+    digest = hashlib.sha256()
+    with path.open(mode="rb") as file:
+        while chunk := file.read(1 << 20):
+            digest.update(chunk)
+
+    _fingerprints[path] = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    return _fingerprints[path]
+
+
+class Uploader:
+    """Uploads files to litterbox over one shared HTTP session.
+
+    Uploads run concurrently, limited per host, and each file gets its own timeout and a
+    few retries with exponential backoff.
+
+    Links are cached by file content (hash, size and mtime) until they are close to
+    expiring, and concurrent requests for the same file share a single upload, so a file
+    that many people look at is uploaded at most once per link lifetime.
+    """
+
+    def __init__(self) -> None:
+        options = config["uploads"]
+        self.concurrency = options["concurrency"].get(confuse.Integer(default=4))
+        self.retries = options["retries"].get(confuse.Integer(default=3))
+        self.timeout = options["timeout"].get(confuse.Number(default=60))
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        # (sha256, size, mtime) -> (link, expiry timestamp).
+        self._links: dict[tuple[str, int, int], tuple[str, float]] = {}
+        self._pending: dict[tuple[str, int, int], asyncio.Task] = {}
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def _get_semaphore(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).netloc
+        if host not in self._semaphores:
+            self._semaphores[host] = asyncio.Semaphore(self.concurrency)
+        return self._semaphores[host]
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def upload(
+        self, path: pathlib.Path, mime_type: str = "application/octet-stream"
+    ) -> str:
+        """Return a download link for a file, uploading it only if no valid link is cached."""
+        size, mtime, digest = await executor.filesystem.run(fingerprint, path)
+        key = (digest, size, mtime)
+
+        cached = self._links.get(key)
+        if cached is not None and cached[1] - LINK_MARGIN > time.time():
+            return cached[0]
+
+        task = self._pending.get(key)
+        if task is None:
+            task = self._pending[key] = asyncio.create_task(
+                self._cache(key, path, mime_type)
+            )
+            task.add_done_callback(lambda _: self._pending.pop(key, None))
+
+        # Shielded so that one cancelled caller does not cancel the upload for the others.
+        return await asyncio.shield(task)
+
+    async def _cache(
+        self, key: tuple[str, int, int], path: pathlib.Path, mime_type: str
+    ) -> str:
+        expires_on = time.time() + LINK_LIFETIME
+        link = await self._upload(path, mime_type)
+
+        now = time.time()
+        for stale in [k for k, v in self._links.items() if v[1] <= now]:
+            del self._links[stale]
+        self._links[key] = (link, expires_on)
+        return link
+
+    async def _upload(self, path: pathlib.Path, mime_type: str) -> str:
+        session = self.get_session()
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with self._get_semaphore(LITTERBOX_URL):
+            for attempt in range(self.retries + 1):
+                try:
+                    with path.open(mode="rb") as file:
+                        data = aiohttp.FormData()
+                        data.add_field("time", LINK_TIME)
+                        data.add_field("reqtype", "fileupload")
+                        data.add_field(
+                            "fileToUpload",
+                            file,
+                            filename=path.name,
+                            content_type=mime_type,
+                        )
+                        async with session.post(
+                            LITTERBOX_URL, data=data, timeout=timeout
+                        ) as response:
+                            response.raise_for_status()
+                            return (await response.text()).strip()
+                except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+                    if attempt == self.retries:
+                        raise
+
+                    delay = 2**attempt
+                    log.warning(
+                        f"Upload of '{path.name}' failed ({error!r}), retrying in {delay}s."
+                    )
+                    await asyncio.sleep(delay)
+
+    async def upload_many(
+        self, paths: list[pathlib.Path], mime_types: list[str] = None
+    ) -> AsyncIterator[tuple[int, str | None]]:
+        """Upload files concurrently, yielding (index, link) in order of completion.
+
+        The link is None if the file could not be uploaded.
+        """
+        mime_types = mime_types or ["application/octet-stream"] * len(paths)
+
+        async def task(index: int, path: pathlib.Path) -> tuple[int, str | None]:
+            try:
+                return index, await self.upload(path, mime_types[index])
+            except Exception as error:
+                log.error(f"Unable to upload '{path}': {error!r}")
+                return index, None
+
+        for future in asyncio.as_completed(
+            [task(index, path) for index, path in enumerate(paths)]
+        ):
+            yield await future
+
+
+async def get_links(
+    paths: list[pathlib.Path],
+    on_update: Callable[[list[str | None]], Awaitable[None]] = None,
+    mime_types: list[str] = None,
+    interval: float = 1.0,
+) -> list[str | None]:
+    """Upload files and return their links in the same order as `paths`.
+
+    `on_update` is called with the links available so far (None for pending or failed
+    uploads) as uploads complete, at most once per `interval` seconds, so that the caller
+    can render partial results.
+    """
+    links: list[str | None] = [None] * len(paths)
+    last_update = time.monotonic()
+    async for index, link in uploader.upload_many(paths, mime_types):
+        links[index] = link
+        if on_update and time.monotonic() - last_update >= interval:
+            last_update = time.monotonic()
+            await on_update(links)
+    return links
+
+
+uploader = Uploader()
@@ -0,0 +1,71 @@
+"""Check that calibrated scores beat the plain mean of the peer reviews.
+
+Simulates assignments where every team is reviewed by `size` other teams, each with its
+own bias and noise, and compares the mean absolute error of calibrate() against the
+unweighted mean. Exits with status 1 if calibration does worse at any size.
+
+Usage: python scripts/check-calibration.py
+"""
+import os
+import pathlib
+import sys
+
+import numpy as np
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from modules.utils import scoring  # noqa: E402
+
+TEAMS = 40
+TRIALS = 200
+SIZES = (2, 3, 4, 5)
+# (bias standard deviation, largest noise standard deviation) of the reviewers.
+SCENARIOS = ((0.05, 0.12), (0.08, 0.22), (0.1, 0.06))
+
+
+def simulate(
+    rng: np.random.Generator, size: int, bias_sd: float, noise_sd: float
+) -> tuple[float, float]:
+    truth = rng.uniform(0.5, 0.95, TEAMS)
+    bias = rng.normal(0.0, bias_sd, TEAMS)
+    noise = rng.uniform(0.02, noise_sd, TEAMS)
+
+    order = rng.permutation(TEAMS)
+    columns = np.tile(order, size)
+    rows = np.concatenate([np.roll(order, -shift) for shift in range(1, size + 1)])
+    values = (
+        truth[rows] + bias[columns] + rng.normal(0.0, 1.0, len(rows)) * noise[columns]
+    )
+    values = np.clip(values, 0.0, 1.0)
+
+    calibration = scoring.calibrate(
+        rows, columns, values, np.full(TEAMS, np.nan), TEAMS
+    )
+    mean = np.bincount(rows, weights=values, minlength=TEAMS) / size
+    return (
+        float(np.abs(calibration.scores - truth).mean()),
+        float(np.abs(mean - truth).mean()),
+    )
+
+
+def main() -> int:
+    failed = False
+    for bias_sd, noise_sd in SCENARIOS:
+        for size in SIZES:
+            rng = np.random.default_rng(size)
+            errors = np.array(
+                [simulate(rng, size, bias_sd, noise_sd) for _ in range(TRIALS)]
+            ).mean(axis=0)
+            worse = errors[0] > errors[1]
+            failed |= worse
+            print(
+                f"bias {bias_sd:.2f}, noise {noise_sd:.2f}, size {size}: "
+                f"calibrated {errors[0]:.4f}, mean {errors[1]:.4f}"
+                + (" WORSE" if worse else "")
+            )
+    return int(failed)
+
+
+if __name__ == "__main__":
+    sys.exit(main())